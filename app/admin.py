@@ -28,6 +28,13 @@ class OfficialSearchApplicationAdmin(admin.ModelAdmin):
     list_display = ("id", "applicant", "parcel_number", "county", "registry", "status", "assigned_to", "submitted_at")
     list_filter = ("status", "county", "registry")
     search_fields = ("parcel_number", "applicant__username", "registry")
+    # once created, these only change through app.transitions, which keeps the status
+    # counters and the ApplicationEvent log in step; a plain save() would bypass both
+    transition_fields = ("status", "registry", "assigned_to")
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly = super().get_readonly_fields(request, obj)
+        return (*readonly, *self.transition_fields) if obj is not None else readonly
 
 
 @admin.register(Payment)
@@ -1,6 +1,35 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    from . import search
+    search.ensure_triggers(connections[using])
+
+
+def install_query_metrics(sender, connection, **kwargs):
+    from . import metrics
+    metrics.install(connection)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        post_migrate.connect(restore_search_triggers, sender=self)
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_query_metrics)
+        # register the background job functions for app.jobs
+        from . import tasks  # noqa: F401
@@ -0,0 +1,92 @@
+import heapq
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import OfficialSearchApplication
+from .transitions import transition_many
+
+User = get_user_model()
+
+STRATEGIES = ("least-loaded", "round-robin")
+
+
+class AutoAssigner:
+    """
+    Hands a registry's submitted applications, oldest first, to its registrars.
+
+    least-loaded: each application goes to the registrar with the fewest open
+    (`assigned`) applications, recounted from the database at the start of every batch.
+    round-robin: registrars take turns, continuing where the previous batch stopped.
+    """
+
+    def __init__(self, registry, strategy="least-loaded"):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown assignment strategy {strategy!r}.")
+        self.registry = registry
+        self.strategy = strategy
+        self._registrars = []
+        self._turns = None
+
+    def open_loads(self):
+        return dict(
+            User.objects.filter(role="is_registrar", registry=self.registry, is_active=True)
+            .annotate(open=Count("assigned_applications", filter=Q(assigned_applications__status="assigned")))
+            .values_list("id", "open")
+        )
+
+    def plan(self, application_ids, loads):
+        """Map registrar id -> application ids for one batch."""
+        plan = {}
+        if self.strategy == "least-loaded":
+            heap = [(load, registrar_id) for registrar_id, load in loads.items()]
+            heapq.heapify(heap)
+            for app_id in application_ids:
+                load, registrar_id = heapq.heappop(heap)
+                plan.setdefault(registrar_id, []).append(app_id)
+                heapq.heappush(heap, (load + 1, registrar_id))
+        else:
+            if set(self._registrars) != set(loads):
+                self._registrars = sorted(loads)
+                self._turns = itertools.cycle(self._registrars)
+            for app_id in application_ids:
+                plan.setdefault(next(self._turns), []).append(app_id)
+        return plan
+
+    def run_batch(self, batch_size=100):
+        """Assign up to batch_size submitted applications; returns how many were assigned."""
+        with transaction.atomic():
+            loads = self.open_loads()
+            if not loads:
+                return 0
+            # skip rows another worker has already claimed (no-op on SQLite)
+            application_ids = list(
+                OfficialSearchApplication.objects.select_for_update(skip_locked=True)
+                .filter(registry=self.registry, status="submitted")
+                .order_by("submitted_at", "id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            assigned = 0
+            for registrar_id, app_ids in self.plan(application_ids, loads).items():
+                assigned += transition_many(
+                    OfficialSearchApplication.objects.filter(id__in=app_ids), "assign", self.registry,
+                    sources=["submitted"], assigned_to_id=registrar_id,
+                )
+        return assigned
+
+    def run(self, batch_size=100):
+        total = 0
+        while True:
+            assigned = self.run_batch(batch_size)
+            total += assigned
+            if assigned < batch_size:
+                return total
+
+
+def registries_with_backlog():
+    return list(
+        OfficialSearchApplication.objects.filter(status="submitted")
+        .order_by("registry").values_list("registry", flat=True).distinct()
+    )
@@ -0,0 +1,116 @@
+"""
+Async (ASGI) versions of the read endpoints, mounted under api/v1/async/.
+
+Each view borrows its queryset, filterset, permission classes and serializer from
+the sync DRF view it mirrors, so both return the same data; the sync views remain
+the default routes. Under WSGI these still work, but gain nothing.
+"""
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from . import search
+from .authentication import ClaimsJWTAuthentication
+from .conditional import LIST_VALIDATORS, list_etag
+from .downloads import aserve_file
+from .renderers import json_response
+from .models import Certificate
+
+
+class AsyncAPIView(View):
+    sync_view_class = None
+
+    async def initial(self, request):
+        """Authenticate and check the sync view's permissions; returns an error response or None."""
+        try:
+            result = await ClaimsJWTAuthentication().aauthenticate(request)
+        except (AuthenticationFailed, InvalidToken) as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+            return JsonResponse(detail, status=401)
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user, request.auth = result
+
+        for permission in self.sync_view_class.permission_classes:
+            if not permission().has_permission(request, self):
+                return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+        return None
+
+
+class AsyncApplicationListView(AsyncAPIView):
+    # page-number pagination only; cursor mode stays on the sync views
+
+    async def get(self, request):
+        error = await self.initial(request)
+        if error:
+            return error
+
+        view = self.sync_view_class()
+        view.request = request
+        try:
+            queryset = view.get_queryset()
+        except ValidationError as exc:
+            # bad ?fields= / ?expand=
+            return JsonResponse(exc.detail, status=400)
+        if "parcel_number" in request.GET:
+            # the search backend probes the schema once per process; keep that off the event loop
+            await sync_to_async(search.is_available)(connections[queryset.db])
+        filterset = view.filterset_class(request.GET, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=400)
+        queryset = filterset.qs
+
+        page_size = api_settings.PAGE_SIZE
+        try:
+            page = int(request.GET.get("page", 1))
+        except ValueError:
+            page = 0
+        # the COUNT the page needs anyway also validates the client's cached copy
+        validators = await queryset.order_by().prefetch_related(None).aaggregate(**LIST_VALIDATORS)
+        count = validators["count"]
+        etag = list_etag(request, variant="json", **validators)
+        offset = (page - 1) * page_size
+        if page < 1 or (offset and offset >= count):
+            return JsonResponse({"detail": "Invalid page."}, status=404)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            # async iteration evaluates the page (and its prefetches) in one hop;
+            # aiterator() doesn't support prefetch_related on Django 4.2
+            results = [application async for application in queryset[offset:offset + page_size]]
+
+            url = request.build_absolute_uri()
+            if page == 1:
+                previous_url = None
+            elif page == 2:
+                previous_url = remove_query_param(url, "page")
+            else:
+                previous_url = replace_query_param(url, "page", page - 1)
+            response = json_response({
+                "count": count,
+                "next": replace_query_param(url, "page", page + 1) if offset + page_size < count else None,
+                "previous": previous_url,
+                "results": view.serializer_class(results, many=True, context={"request": request}).data,
+            })
+        response["ETag"] = etag
+        return response
+
+
+class AsyncCertificateFileView(AsyncAPIView):
+
+    async def get(self, request, pk):
+        error = await self.initial(request)
+        if error:
+            return error
+
+        certificate = await Certificate.objects.filter(
+            pk=pk, application__applicant_id=request.user.id
+        ).only("signed_file").afirst()
+        if certificate is None or not certificate.signed_file:
+            return JsonResponse({"detail": "Not found."}, status=404)
+        return await aserve_file(request, certificate.signed_file)
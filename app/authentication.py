@@ -0,0 +1,148 @@
+"""
+Stateless JWT authentication for read-heavy endpoints.
+
+LoginView embeds the fields the permission classes and views read (role, registry,
+county, username) plus the user's token_version as claims. ClaimsJWTAuthentication
+then builds a ClaimsUser from the token instead of loading the CustomUser row.
+Revocation is a version check against a short-TTL cache entry, so a role change,
+password change or deactivation invalidates outstanding tokens within
+AUTH_TOKEN_VERSION_TTL seconds (immediately with a shared cache).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+CLAIMS = ("username", "role", "registry", "county")
+VERSION_CLAIM = "ver"
+REVOKED = -1
+
+
+def version_cache_key(user_id):
+    return f"auth:token-version:{user_id}"
+
+
+def tokens_for_user(user):
+    refresh = RefreshToken.for_user(user)
+    if getattr(settings, "AUTH_TOKEN_CLAIMS", True):
+        for claim in CLAIMS:
+            refresh[claim] = getattr(user, claim)
+        refresh[VERSION_CLAIM] = user.token_version
+    return refresh
+
+
+def current_token_version(user_id):
+    key = version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        User = get_user_model()
+        # always the primary: a lagging replica would re-cache a revoked version
+        version = User.objects.db_manager(router.db_for_write(User)).filter(pk=user_id, is_active=True).values_list("token_version", flat=True).first()
+        version = REVOKED if version is None else version
+        cache.set(key, version, getattr(settings, "AUTH_TOKEN_VERSION_TTL", 30))
+    return version
+
+
+async def acurrent_token_version(user_id):
+    key = version_cache_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        User = get_user_model()
+        version = await User.objects.db_manager(router.db_for_write(User)).filter(pk=user_id, is_active=True).values_list("token_version", flat=True).afirst()
+        version = REVOKED if version is None else version
+        await cache.aset(key, version, getattr(settings, "AUTH_TOKEN_VERSION_TTL", 30))
+    return version
+
+
+def request_token(request):
+    """
+    The valid bearer token of a request, or None. Decoded once and kept on the Django request,
+    so ReplicaRoutingMiddleware and the authentication classes below share it. Never hits the DB.
+    """
+    request = getattr(request, "_request", request)
+    try:
+        return request._validated_token
+    except AttributeError:
+        pass
+    validated_token = None
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = header and authentication.get_raw_token(header)
+        if raw_token:
+            validated_token = authentication.get_validated_token(raw_token)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        pass
+    request._validated_token = validated_token
+    return validated_token
+
+
+def token_user_id(request):
+    """User id from a valid bearer token on a plain Django request, or None. Never hits the DB."""
+    validated_token = request_token(request)
+    return None if validated_token is None else validated_token.get(api_settings.USER_ID_CLAIM)
+
+
+class ClaimsUser(TokenUser):
+    @property
+    def role(self):
+        return self.token["role"]
+
+    @property
+    def registry(self):
+        return self.token["registry"]
+
+    @property
+    def county(self):
+        return self.token["county"]
+
+
+class RequestTokenAuthentication(JWTAuthentication):
+    """JWTAuthentication that reuses the token request_token() already decoded for this request."""
+
+    def authenticate(self, request):
+        validated_token = self.validated_request_token(request)
+        if validated_token is None:
+            return None
+        return self.get_user(validated_token), validated_token
+
+    def validated_request_token(self, request):
+        """request_token(), raising as JWTAuthentication does when a token is sent but invalid."""
+        validated_token = request_token(request)
+        if validated_token is None:
+            header = self.get_header(request)
+            raw_token = header and self.get_raw_token(header)
+            if raw_token:
+                self.get_validated_token(raw_token)
+        return validated_token
+
+
+class ClaimsJWTAuthentication(RequestTokenAuthentication):
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token or any(claim not in validated_token for claim in CLAIMS):
+            # token minted without claims: fall back to loading the user
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if current_token_version(user_id) != validated_token[VERSION_CLAIM]:
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return ClaimsUser(validated_token)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate() for plain Django async views."""
+        validated_token = self.validated_request_token(request)
+        if validated_token is None:
+            return None
+
+        if VERSION_CLAIM not in validated_token or any(claim not in validated_token for claim in CLAIMS):
+            return await sync_to_async(super().get_user)(validated_token), validated_token
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if await acurrent_token_version(user_id) != validated_token[VERSION_CLAIM]:
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return ClaimsUser(validated_token), validated_token
@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend whose atomic blocks start with BEGIN IMMEDIATE.
+
+    A deferred transaction that reads and then writes can't wait for the write lock: SQLite
+    fails the upgrade with "database is locked" straight away instead of honouring
+    busy_timeout. Taking the lock up front makes concurrent writers queue instead.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
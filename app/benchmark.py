@@ -0,0 +1,320 @@
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from . import counters
+from .models import ApplicationEvent, Certificate, OfficialSearchApplication, Payment, Review
+
+User = get_user_model()
+
+REGISTRIES = [
+    "Nairobi", "Mombasa", "Kisumu", "Nakuru", "Uasin Gishu", "Kiambu", "Machakos",
+    "Kakamega", "Kisii", "Nyeri", "Meru", "Kilifi", "Bungoma", "Kajiado", "Kericho",
+    "Embu", "Migori", "Homa Bay", "Siaya", "Trans Nzoia",
+]
+
+# rough share of applications in each status on a live registry
+STATUS_WEIGHTS = {
+    "pending": 10,
+    "submitted": 20,
+    "assigned": 20,
+    "completed": 40,
+    "rejected": 10,
+}
+
+
+# every seeded certificate points at this one small file
+CERTIFICATE_FILE = "certificates/benchmark.pdf"
+
+REVIEW_COMMENTS = [
+    "Parcel number does not match the registry index.",
+    "Applicant details do not match the title.",
+    "Title is under caution; search cannot be issued.",
+]
+
+# seeded applications are spread over this many days before now
+HISTORY_DAYS = 180
+
+
+@contextmanager
+def given_timestamps():
+    """Let bulk inserts keep the timestamps set on the objects instead of auto_now_add's now()."""
+    fields = [
+        OfficialSearchApplication._meta.get_field("submitted_at"),
+        Payment._meta.get_field("paid_at"),
+        Certificate._meta.get_field("uploaded_at"),
+        Review._meta.get_field("created_at"),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def seed_applications(total, batch_size=5000, seed=42, log=None, related=False):
+    """
+    Bulk insert `total` applications (plus the users that own them) spread over REGISTRIES.
+    With `related`, also the payments, certificates, reviews and transition events their
+    statuses imply.
+    """
+    rng = random.Random(seed)
+    if related and not default_storage.exists(CERTIFICATE_FILE):
+        default_storage.save(CERTIFICATE_FILE, ContentFile(b"%PDF-1.4\n" + b"0" * 64 * 1024))
+    offset = OfficialSearchApplication.objects.count()
+    prefix = f"bench{offset}"
+
+    registrars = {}
+    for registry in REGISTRIES:
+        users = User.objects.bulk_create([
+            User(username=f"{prefix}-reg-{registry}-{i}", county=registry, registry=registry,
+                 role="is_registrar", password="!")
+            for i in range(5)
+        ])
+        User.objects.bulk_create([
+            User(username=f"{prefix}-ric-{registry}", county=registry, registry=registry,
+                 role="is_registrar_in_charge", password="!")
+        ])
+        registrars[registry] = [user.pk for user in User.objects.filter(username__in=[u.username for u in users])]
+
+    applicant_count = max(total // 100, 10)
+    User.objects.bulk_create(
+        [User(username=f"{prefix}-app-{i}", county=rng.choice(REGISTRIES), role="normal", password="!")
+         for i in range(applicant_count)],
+        batch_size=batch_size,
+    )
+    applicants = list(User.objects.filter(username__startswith=f"{prefix}-app-").values_list("pk", flat=True))
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    now = timezone.now()
+    created = 0
+    while created < total:
+        rows = []
+        for i in range(created, min(created + batch_size, total)):
+            registry = rng.choice(REGISTRIES)
+            status = rng.choices(statuses, weights)[0]
+            rows.append(OfficialSearchApplication(
+                applicant_id=rng.choice(applicants),
+                parcel_number=f"{registry.upper().replace(' ', '')}/BLOCK{rng.randint(1, 400)}/{rng.randint(1, 99999)}",
+                purpose="Official search",
+                county=registry,
+                registry=registry,
+                status=status,
+                assigned_to_id=None if status in ("pending", "submitted") else rng.choice(registrars[registry]),
+                submitted_at=now - timedelta(minutes=rng.randint(0, HISTORY_DAYS * 24 * 60)),
+            ))
+        with given_timestamps():
+            OfficialSearchApplication.objects.bulk_create(rows, batch_size=batch_size)
+            if related:
+                seed_related(rows, rng, batch_size, now)
+        created += len(rows)
+        if log:
+            log(f"  seeded {created}/{total} applications")
+    return created
+
+
+def seed_related(applications, rng, batch_size, now):
+    """
+    Related rows for freshly inserted `applications`, timed forwards from submitted_at:
+    each later step happens between then and `now`.
+    """
+    def after(moment, max_minutes):
+        return min(moment + timedelta(minutes=rng.randint(1, max_minutes)), now)
+
+    payments, certificates, reviews, events = [], [], [], []
+    for app in applications:
+        if app.status == "pending":
+            continue
+        paid_at = after(app.submitted_at, 48 * 60)
+        payments.append(Payment(
+            application_id=app.pk, amount=1050, invoice_number=f"BENCH{app.pk:010d}",
+            payment_reference=f"{rng.getrandbits(48):012X}", paid_at=paid_at,
+        ))
+        events.append(ApplicationEvent(
+            application_id=app.pk, registry=app.registry, from_status="pending", to_status="submitted",
+            created_at=paid_at,
+        ))
+        if app.status == "submitted":
+            continue
+        assigned_at = after(paid_at, 72 * 60)
+        events.append(ApplicationEvent(
+            application_id=app.pk, registry=app.registry, from_status="submitted", to_status="assigned",
+            registrar_id=app.assigned_to_id, created_at=assigned_at,
+        ))
+        if app.status == "assigned":
+            continue
+        decided_at = after(assigned_at, 10 * 24 * 60)
+        events.append(ApplicationEvent(
+            application_id=app.pk, registry=app.registry, from_status="assigned", to_status=app.status,
+            registrar_id=app.assigned_to_id, created_at=decided_at,
+        ))
+        if app.status == "completed":
+            certificates.append(Certificate(
+                application_id=app.pk, uploaded_by_id=app.assigned_to_id, signed_file=CERTIFICATE_FILE,
+                uploaded_at=decided_at,
+            ))
+        else:
+            reviews.append(Review(
+                application_id=app.pk, reviewer_id=app.assigned_to_id, comment=rng.choice(REVIEW_COMMENTS),
+                created_at=decided_at,
+            ))
+    for model, objs in ((Payment, payments), (Certificate, certificates), (Review, reviews), (ApplicationEvent, events)):
+        model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+def time_call(fn, repeat):
+    """Run fn `repeat` times and return (median, max) wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of already sorted samples."""
+    if not samples:
+        return 0
+    return samples[max(0, -(-len(samples) * p // 100) - 1)]
+
+
+def drive(base_url, make_request, concurrency=50, requests=1000, timeout=30, on_response=None):
+    """
+    Send up to `requests` HTTP requests from `concurrency` threads and summarise them.
+
+    make_request() returns (method, path, headers, body), or None once it has nothing left
+    to send (those count as skipped). on_response(spec, body) is called for each 2xx reply.
+    """
+    def fetch(_):
+        spec = make_request()
+        if spec is None:
+            return None
+        method, path, headers, body = spec
+        request = urllib.request.Request(base_url + path, data=body, headers=headers, method=method)
+        start = time.perf_counter()
+        status, content = None, b""
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                status = response.status
+                if on_response:
+                    content = response.read()
+                else:
+                    while response.read(65536):
+                        pass
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        except (urllib.error.URLError, OSError):
+            pass
+        elapsed = (time.perf_counter() - start) * 1000
+        if on_response and status is not None and 200 <= status < 300:
+            on_response(spec, content)
+        return elapsed, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    sent = [result for result in results if result is not None]
+    samples = sorted(ms for ms, _ in sent)
+    return {
+        "requests": len(sent),
+        "skipped": requests - len(sent),
+        "errors": sum(1 for _, status in sent if status is None or status >= 400),
+        "rps": len(sent) / elapsed if sent else 0,
+        "mean": statistics.fmean(samples) if samples else 0,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+def run_load(url, headers=None, concurrency=50, requests=1000, timeout=30):
+    """GET `url` `requests` times from `concurrency` threads and summarise throughput and latency."""
+    return drive("", lambda: ("GET", url, headers or {}, None), concurrency, requests, timeout)
+
+
+def _read_page(rng):
+    registry = rng.choice(REGISTRIES)
+    list(
+        OfficialSearchApplication.objects.exclude(status="pending").filter(registry=registry)
+        .order_by("submitted_at", "id").with_related()[:10]
+    )
+
+
+def _write(rng, applicants):
+    registry = rng.choice(REGISTRIES)
+    if rng.random() < 0.5:
+        OfficialSearchApplication.objects.create(
+            applicant_id=rng.choice(applicants), parcel_number=f"LOAD/{rng.randint(1, 99999)}",
+            purpose="Official search", county=registry, registry=registry, status="submitted",
+        )
+        return
+    # payment/assignment shaped: flip one application's status and its counters together
+    with transaction.atomic():
+        pk = (
+            OfficialSearchApplication.objects.filter(registry=registry, status="submitted")
+            .values_list("pk", flat=True).first()
+        )
+        if pk and OfficialSearchApplication.objects.filter(pk=pk, status="submitted").update(status="assigned"):
+            counters.record_transition(registry, "submitted", "assigned")
+
+
+def run_mixed(workers=8, seconds=10, write_share=0.2, reconnect=False, seed=42):
+    """
+    Hammer the database from `workers` threads for `seconds`, doing list-page reads and
+    `write_share` writes. `reconnect` closes the connection after every operation, as a
+    request does with CONN_MAX_AGE = 0.
+    """
+    applicants = list(User.objects.filter(role="normal").values_list("pk", flat=True)[:1000])
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        stats = {"read": [], "write": [], "locked": 0}
+        try:
+            while time.perf_counter() < deadline:
+                kind = "write" if rng.random() < write_share else "read"
+                start = time.perf_counter()
+                try:
+                    _write(rng, applicants) if kind == "write" else _read_page(rng)
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+                    stats["locked"] += 1
+                else:
+                    stats[kind].append((time.perf_counter() - start) * 1000)
+                if reconnect:
+                    connection.close()
+        finally:
+            connection.close()
+        return stats
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(worker, range(workers)))
+
+    summary = {"locked": sum(r["locked"] for r in results)}
+    for kind in ("read", "write"):
+        samples = sorted(ms for r in results for ms in r[kind])
+        summary[kind] = {
+            "ops": len(samples),
+            "ops_per_s": len(samples) / seconds,
+            "p50": samples[len(samples) // 2] if samples else 0,
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0,
+        }
+    return summary
@@ -0,0 +1,68 @@
+"""
+Negotiated response compression for CompressionMiddleware.
+
+Brotli is used when the client accepts it and the optional `brotli` package is installed,
+gzip otherwise. Only complete (non-streaming) 2xx JSON responses of at least
+COMPRESSION_MIN_SIZE bytes are compressed: file downloads stream and are left to the
+front proxy, and small bodies aren't worth the CPU. HTML (the admin, the browsable API)
+is never compressed: its pages carry a CSRF token next to reflected request input, which
+compression would expose to BREACH. Levels default to fast settings suited to
+per-request compression (`manage.py benchmark_render` compares the trade-off).
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def min_size():
+    return getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+
+
+def is_compressible(content_type):
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def accepted_encodings(header):
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    codings = {}
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    """The best coding we can produce for this Accept-Encoding, or None; ties go to brotli."""
+    codings = accepted_encodings(header or "")
+    best, best_q = None, 0.0
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        q = codings.get(coding, codings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, encoding, level=None):
+    if encoding == "br":
+        quality = getattr(settings, "COMPRESSION_BROTLI_QUALITY", 4) if level is None else level
+        return brotli.compress(data, quality=quality)
+    level = getattr(settings, "COMPRESSION_GZIP_LEVEL", 6) if level is None else level
+    return gzip.compress(data, compresslevel=level, mtime=0)
@@ -0,0 +1,54 @@
+"""
+Conditional GET for the application lists and certificate metadata.
+
+A list's ETag is a hash of the newest modified_at and the row count of the filtered
+queryset, plus who is asking and the exact query (page, filters, format). Any status
+transition bumps modified_at and any row entering or leaving the set changes the count,
+so one aggregate query decides whether the page could have changed; a match answers
+304 without loading or serializing the page. Lists send no Last-Modified: an application
+leaving a list (reassigned to someone else) doesn't move that list's newest modified_at,
+so If-Modified-Since alone would miss it.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+LIST_VALIDATORS = {"latest": Max("modified_at"), "count": Count("id")}
+
+
+def list_validators(queryset):
+    """Arguments for list_etag(): an aggregate over `queryset` without its ordering and prefetches."""
+    return queryset.order_by().prefetch_related(None).aggregate(**LIST_VALIDATORS)
+
+
+def list_etag(request, latest, count, variant=""):
+    digest = hashlib.sha256()
+    for part in (request.user.pk, request.get_full_path(), variant, latest and latest.isoformat(), count):
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return "W/" + quote_etag(digest.hexdigest()[:32])
+
+
+def conditional(request, build, etag, last_modified=None):
+    """
+    304 (or 412) when the request's validators match, otherwise build() the response;
+    either way it carries the validators.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build()
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+class ConditionalListMixin:
+    """For ListAPIViews over OfficialSearchApplication: ETag the filtered list, answer 304 on a match."""
+
+    def list(self, request, *args, **kwargs):
+        validators = list_validators(self.filter_queryset(self.get_queryset()))
+        etag = list_etag(request, variant=request.accepted_renderer.format, **validators)
+        return conditional(request, lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs), etag)
@@ -0,0 +1,50 @@
+"""
+Denormalized per-(registry, status) application counts behind the registrar-in-charge
+dashboard. Every status change adjusts them in the same transaction; the
+rebuild_status_counters command recomputes them from scratch.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import OfficialSearchApplication, RegistryStatusCounter
+
+
+def adjust(registry, status, delta):
+    if not delta:
+        return
+    counters = RegistryStatusCounter.objects.filter(registry=registry, status=status)
+    if not counters.update(count=F("count") + delta):
+        RegistryStatusCounter.objects.get_or_create(registry=registry, status=status)
+        counters.update(count=F("count") + delta)
+
+
+def record_created(registry, status, count=1):
+    adjust(registry, status, count)
+
+
+def record_transition(registry, from_status, to_status, count=1):
+    if from_status == to_status or not count:
+        return
+    adjust(registry, from_status, -count)
+    adjust(registry, to_status, count)
+
+
+def snapshot(registry):
+    counts = dict.fromkeys((status for status, _ in OfficialSearchApplication.STATUS_CHOICES), 0)
+    counts.update(
+        RegistryStatusCounter.objects.filter(registry=registry).values_list("status", "count")
+    )
+    return counts
+
+
+def rebuild():
+    with transaction.atomic():
+        RegistryStatusCounter.objects.all().delete()
+        rows = (
+            OfficialSearchApplication.objects.order_by()
+            .values("registry", "status").annotate(total=Count("id"))
+        )
+        RegistryStatusCounter.objects.bulk_create(
+            RegistryStatusCounter(registry=row["registry"], status=row["status"], count=row["total"])
+            for row in rows
+        )
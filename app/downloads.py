@@ -0,0 +1,163 @@
+"""
+File delivery for stored uploads: conditional GET, single byte ranges, and
+optional hand-off to the front proxy (settings.SENDFILE_BACKEND).
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+# fewer, larger reads: each one costs a thread hop under ASGI
+ASYNC_CHUNK_SIZE = 256 * 1024
+
+
+def file_validators(storage, name):
+    """Return (etag, last_modified timestamp, size) for a stored file."""
+    size = storage.size(name)
+    modified = int(storage.get_modified_time(name).timestamp())
+    return quote_etag(f"{modified:x}-{size:x}"), modified, size
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into an inclusive (start, end) pair.
+    Returns None when the header should be ignored (absent, malformed, multi-range, or
+    last-byte-pos before first-byte-pos, which RFC 7233 calls invalid) and raises
+    ValueError when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    # If-Range takes the strong comparison: a weak entity tag never matches
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith("W/"):
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(file, start, length):
+    file.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+async def aread_range(file, start, length):
+    # file reads are hopped onto a thread so the event loop is never blocked on disk
+    read = sync_to_async(file.read, thread_sensitive=False)
+    await sync_to_async(file.seek, thread_sensitive=False)(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = await read(min(ASYNC_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+def sendfile_response(storage, name):
+    """Let nginx (X-Accel-Redirect) or Apache/lighttpd (X-Sendfile) send the file, if configured."""
+    backend = getattr(settings, "SENDFILE_BACKEND", None)
+    if backend == "x-accel-redirect":
+        response = HttpResponse()
+        # a URI nginx decodes again: "?", "#" or "%" in a stored name must not change the path
+        response["X-Accel-Redirect"] = settings.SENDFILE_URL_PREFIX.rstrip("/") + "/" + quote(name)
+        return response
+    if backend == "x-sendfile":
+        response = HttpResponse()
+        response["X-Sendfile"] = storage.path(name)
+        return response
+    return None
+
+
+def serve_file(request, file_field, filename=None, async_body=False):
+    storage, name = file_field.storage, file_field.name
+    filename = filename or os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    response = sendfile_response(storage, name)
+    if response is not None:
+        # the proxy handles ranges and validators itself
+        response["Content-Type"] = content_type
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+        return response
+
+    etag, last_modified, size = file_validators(storage, name)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = None
+        # a failed If-Range means the whole file, whatever the Range asked for
+        if if_range_matches(request, etag, last_modified):
+            try:
+                byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            reader = aread_range if async_body else read_range
+            response = StreamingHttpResponse(
+                reader(storage.open(name, "rb"), start, end - start + 1),
+                status=206, content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = str(end - start + 1)
+        elif async_body:
+            response = StreamingHttpResponse(aread_range(storage.open(name, "rb"), 0, size), content_type=content_type)
+            response["Content-Length"] = str(size)
+        else:
+            response = FileResponse(storage.open(name, "rb"), content_type=content_type)
+            response["Content-Length"] = str(size)
+        response["Content-Disposition"] = content_disposition_header(True, filename)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+async def aserve_file(request, file_field, filename=None):
+    # stat/open run on a worker thread; the body is then streamed by the event loop
+    return await sync_to_async(serve_file, thread_sensitive=False)(
+        request, file_field, filename, async_body=True
+    )
@@ -1,12 +1,23 @@
 import django_filters
 from .models import OfficialSearchApplication
+from . import search
 
 class ApplicationFilter(django_filters.FilterSet):
-    status = django_filters.CharFilter(field_name="status", lookup_expr="iexact")
-    parcel_number = django_filters.CharFilter(field_name="parcel_number", lookup_expr="icontains")
-    reference_number = django_filters.CharFilter(field_name="reference_number", lookup_expr="icontains")
+    status = django_filters.CharFilter(method="filter_status")
+    parcel_number = django_filters.CharFilter(method="filter_parcel_number")
+    reference_number = django_filters.CharFilter(method="filter_reference_number")
 
     class Meta:
         model = OfficialSearchApplication
         fields = ["status", "parcel_number", "reference_number"]
 
+    def filter_status(self, queryset, name, value):
+        # statuses are stored lowercase, so an exact match keeps the status indexes usable
+        return queryset.filter(status=value.strip().lower())
+
+    def filter_parcel_number(self, queryset, name, value):
+        return search.filter_parcel_number(queryset, value)
+
+    def filter_reference_number(self, queryset, name, value):
+        return search.filter_reference_number(queryset, value)
+
@@ -0,0 +1,140 @@
+"""
+Idempotency-Key support for POST endpoints that create things.
+
+A client that retries a request with the same Idempotency-Key header gets the first
+response replayed (with `Idempotent-Replayed: true`) instead of the view running again.
+Keys are scoped per user. Completed responses are kept in the cache for IDEMPOTENCY_TTL
+seconds, with an IdempotencyRecord row as the durable fallback. The row's unique
+(user, key) constraint is also the lock: while the first request is still running,
+a duplicate gets 409. Reusing a key with a different body gets 422. Only successful
+responses are stored; errors release the key so the client can fix the request and retry.
+Expired rows are removed by `manage.py purge_idempotency_keys`.
+"""
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def ttl():
+    return getattr(settings, "IDEMPOTENCY_TTL", 24 * 60 * 60)
+
+
+def cache_key(user_id, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{user_id}:{digest}"
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.path):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def replay(stored):
+    response = Response(stored["response"], status=stored["status_code"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def claim(user_id, key, request_fingerprint):
+    """
+    Insert the in-flight record for the key. Returns None once claimed, or the existing
+    record when another request already holds (or has answered) the key.
+    """
+    now = timezone.now()
+    lock_timeout = timedelta(seconds=getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 60))
+    while True:
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(
+                    user_id=user_id, key=key, fingerprint=request_fingerprint, expires_at=now + lock_timeout,
+                )
+            return None
+        except IntegrityError:
+            record = IdempotencyRecord.objects.filter(user_id=user_id, key=key).first()
+            if record is None:
+                continue
+            if record.expires_at > now:
+                return record
+            # expired result, or an in-flight claim whose request died: take the key over
+            IdempotencyRecord.objects.filter(pk=record.pk, expires_at=record.expires_at).delete()
+
+
+def release(user_id, key):
+    IdempotencyRecord.objects.filter(user_id=user_id, key=key, status_code=None).delete()
+
+
+def idempotent(view_method):
+    """Decorate an APIView post() so requests carrying an Idempotency-Key run at most once."""
+
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."}, status=400)
+
+        user_id = request.user.id
+        request_fingerprint = fingerprint(request)
+        stored = cache.get(cache_key(user_id, key))
+        if stored is None:
+            record = claim(user_id, key, request_fingerprint)
+            if record is not None:
+                stored = {
+                    "fingerprint": record.fingerprint,
+                    "status_code": record.status_code,
+                    "response": record.response,
+                }
+                if record.status_code is not None:
+                    remaining = (record.expires_at - timezone.now()).total_seconds()
+                    cache.set(cache_key(user_id, key), stored, max(int(remaining), 1))
+
+        if stored is not None:
+            if stored["fingerprint"] != request_fingerprint:
+                return Response(
+                    {"error": f"This {HEADER} was already used with a different request."}, status=422
+                )
+            if stored["status_code"] is None:
+                return Response(
+                    {"error": f"A request with this {HEADER} is still being processed."}, status=409
+                )
+            return replay(stored)
+
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            release(user_id, key)
+            raise
+        if not 200 <= response.status_code < 300:
+            release(user_id, key)
+            return response
+
+        stored = {
+            "fingerprint": request_fingerprint,
+            "status_code": response.status_code,
+            "response": response.data,
+        }
+        IdempotencyRecord.objects.filter(user_id=user_id, key=key).update(
+            status_code=response.status_code,
+            response=response.data,
+            expires_at=timezone.now() + timedelta(seconds=ttl()),
+        )
+        cache.set(cache_key(user_id, key), stored, ttl())
+        return response
+
+    return wrapper
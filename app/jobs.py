@@ -0,0 +1,115 @@
+"""
+A small database-backed job queue; no broker needed.
+
+Register a function with @task, then call enqueue(func, **payload) from request code.
+The Job row is inserted from the transaction's commit hook, so work enqueued by a
+request that rolls back never runs, and a worker never sees rows the request hasn't
+committed yet. `manage.py run_jobs` claims due jobs (SELECT ... FOR UPDATE SKIP LOCKED
+on PostgreSQL; SQLite serialises the claim with BEGIN IMMEDIATE), runs them, and
+retries failures with exponential backoff until max_attempts, after which the row
+stays behind as `failed` with the last traceback.
+"""
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+_tasks = {}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register `func` as a job under `name` (default: module.function)."""
+    def register(func):
+        func.task_name = name or f"{func.__module__}.{func.__name__}"
+        func.max_attempts = max_attempts
+        _tasks[func.task_name] = func
+        return func
+
+    return register(func) if func is not None else register
+
+
+def enqueue(func, delay=0, max_attempts=None, using=None, **payload):
+    """Queue `func(**payload)` to run in a worker once the current transaction commits."""
+    name = getattr(func, "task_name", func)
+    if name not in _tasks:
+        raise ValueError(f"{name!r} is not a registered task.")
+    max_attempts = max_attempts or _tasks[name].max_attempts or getattr(settings, "JOB_MAX_ATTEMPTS", 5)
+
+    def insert():
+        Job.objects.create(
+            name=name, payload=payload, max_attempts=max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    transaction.on_commit(insert, using=using)
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number `attempt`: doubling from JOB_RETRY_DELAY, capped, jittered."""
+    base = getattr(settings, "JOB_RETRY_DELAY", 5)
+    cap = getattr(settings, "JOB_RETRY_MAX_DELAY", 60 * 60)
+    delay = min(base * 2 ** (attempt - 1), cap)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lock_timeout = timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT", 10 * 60))
+
+    def claim(self):
+        """Lock the oldest due job (or one whose worker died mid-run) for this worker."""
+        now = timezone.now()
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status="queued", run_at__lte=now)
+                    | Q(status="running", locked_at__lt=now - self.lock_timeout)
+                )
+                .order_by("run_at", "id")
+                .first()
+            )
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(
+                status="running", locked_by=self.worker_id, locked_at=now, attempts=F("attempts") + 1
+            )
+        job.status, job.locked_by, job.locked_at = "running", self.worker_id, now
+        job.attempts += 1
+        return job
+
+    def run_one(self):
+        """Run one due job; returns False when there was nothing to do."""
+        job = self.claim()
+        if job is None:
+            return False
+
+        func = _tasks.get(job.name)
+        try:
+            if func is None:
+                raise LookupError(f"{job.name!r} is not a registered task.")
+            func(**job.payload)
+        except Exception:
+            self.failed(job, traceback.format_exc(), retry=func is not None)
+        else:
+            Job.objects.filter(pk=job.pk, locked_by=self.worker_id).delete()
+        return True
+
+    def failed(self, job, error, retry=True):
+        mine = Job.objects.filter(pk=job.pk, locked_by=self.worker_id)
+        if retry and job.attempts < job.max_attempts:
+            mine.update(
+                status="queued", locked_by="", locked_at=None, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+            )
+        else:
+            mine.update(status="failed", locked_at=None, last_error=error)
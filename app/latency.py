@@ -0,0 +1,112 @@
+"""
+Time-in-state percentiles from the ApplicationEvent log.
+
+Every event closes the interval the application spent in its from_status: it started at
+the previous event for the same application (LAG over the application's events) or, for
+the first event, at submitted_at. Durations, ranks and nearest-rank p50/p95 are all
+computed in one SQL statement with window functions, so no event rows reach Python.
+Intervals still open (applications waiting right now) are not counted.
+
+The registry and `since` filters narrow the events before the window runs: all of an
+application's events share its registry, and an application with no event since `since`
+has no interval ending then, so either way only whole applications are dropped and LAG
+still sees every earlier event of the ones kept.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+
+from .models import ApplicationEvent, OfficialSearchApplication
+
+# longest look-back the latency endpoint accepts, in days
+MAX_DAYS = 3650
+
+GROUPS = {
+    "registry": "registry",
+    "registrar": "registrar_id",
+}
+
+SQL = """
+WITH intervals AS (
+    SELECT e.registry AS registry,
+           LAG(e.registrar_id) OVER w AS registrar_id,
+           e.from_status AS status,
+           e.created_at AS ended_at,
+           {seconds} AS seconds
+    FROM {events} e
+    JOIN {applications} a ON a.id = e.application_id
+    {scope}
+    WINDOW w AS (PARTITION BY e.application_id ORDER BY e.created_at, e.id)
+),
+ranked AS (
+    SELECT {group} AS grp, status, seconds,
+           ROW_NUMBER() OVER (PARTITION BY {group}, status ORDER BY seconds) AS position,
+           COUNT(*) OVER (PARTITION BY {group}, status) AS total
+    FROM intervals
+    WHERE {group} IS NOT NULL {filters}
+)
+SELECT grp, status, MAX(total),
+       MIN(CASE WHEN position = (total * 50 + 99) / 100 THEN seconds END),
+       MIN(CASE WHEN position = (total * 95 + 99) / 100 THEN seconds END)
+FROM ranked
+GROUP BY grp, status
+ORDER BY grp, status
+"""
+
+
+def seconds_between(vendor, start, end):
+    if vendor == "postgresql":
+        return f"EXTRACT(EPOCH FROM ({end} - {start}))"
+    return f"(julianday({end}) - julianday({start})) * 86400.0"
+
+
+def time_in_state(group_by="registry", registry=None, since=None):
+    """
+    p50/p95 seconds spent in each status, per registry or per registrar, for intervals that
+    ended at or after `since`. Registrar rows are for the registrar holding the application
+    during the interval.
+    """
+    if group_by not in GROUPS:
+        raise ValueError(f"Unknown grouping {group_by!r}.")
+    connection = connections[router.db_for_read(ApplicationEvent)]
+    qn = connection.ops.quote_name
+
+    events = qn(ApplicationEvent._meta.db_table)
+    scope, scope_params, filters, params = [], [], [], []
+    if registry is not None:
+        scope.append("e.registry = %s")
+        scope_params.append(registry)
+    if since is not None:
+        since = connection.ops.adapt_datetimefield_value(since)
+        scope.append(f"e.application_id IN (SELECT application_id FROM {events} WHERE created_at >= %s)")
+        scope_params.append(since)
+        filters.append("AND ended_at >= %s")
+        params.append(since)
+
+    sql = SQL.format(
+        seconds=seconds_between(connection.vendor, "COALESCE(LAG(e.created_at) OVER w, a.submitted_at)", "e.created_at"),
+        events=events,
+        applications=qn(OfficialSearchApplication._meta.db_table),
+        scope=f"WHERE {' AND '.join(scope)}" if scope else "",
+        group=GROUPS[group_by],
+        filters=" ".join(filters),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, scope_params + params)
+        rows = cursor.fetchall()
+
+    names = {}
+    if group_by == "registrar":
+        names = dict(
+            get_user_model().objects.filter(pk__in={row[0] for row in rows}).values_list("pk", "username")
+        )
+    return [
+        {
+            group_by: names.get(group, group),
+            **({"registrar_id": group} if group_by == "registrar" else {}),
+            "status": status,
+            "count": count,
+            "p50_seconds": round(float(p50), 1),
+            "p95_seconds": round(float(p95), 1),
+        }
+        for group, status, count, p50, p95 in rows
+    ]
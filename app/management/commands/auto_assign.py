@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.assignment import STRATEGIES, AutoAssigner, registries_with_backlog
+
+
+class Command(BaseCommand):
+    help = "Assign submitted applications to registrars automatically, per registry."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--registry", action="append", dest="registries",
+            help="Registry to process (repeatable). Defaults to every registry with submitted applications.",
+        )
+        parser.add_argument("--strategy", choices=STRATEGIES, default="least-loaded")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running, polling every INTERVAL seconds. By default run once and exit.",
+        )
+
+    def handle(self, *args, **options):
+        assigners = {}
+        while True:
+            for registry in options["registries"] or registries_with_backlog():
+                if registry not in assigners:
+                    assigners[registry] = AutoAssigner(registry, strategy=options["strategy"])
+                assigned = assigners[registry].run(batch_size=options["batch_size"])
+                if assigned:
+                    self.stdout.write(f"{registry}: assigned {assigned} application(s)")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,388 @@
+import hashlib
+import json
+import random
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from app.authentication import tokens_for_user
+from app.benchmark import REGISTRIES, drive
+from app.models import Certificate, OfficialSearchApplication
+
+User = get_user_model()
+
+LOGIN_USERNAME = "bench-login"
+LOGIN_PASSWORD = "bench-login-password"
+BULK_SIZE = 20
+CERTIFICATE = b"%PDF-1.4\n" + b"0" * (256 * 1024 - 9)
+CERTIFICATE_SHA256 = hashlib.sha256(CERTIFICATE).hexdigest()
+
+
+class Pool:
+    """Work items shared by the load threads; each item is handed out once."""
+
+    def __init__(self, items=()):
+        self.items = deque(items)
+
+    def take(self):
+        try:
+            return self.items.popleft()
+        except IndexError:
+            return None
+
+    def put(self, item):
+        self.items.append(item)
+
+    def sample(self, rng):
+        # reads leave the item in place; a snapshot because writers may be appending
+        items = list(self.items)
+        return rng.choice(items) if items else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every API route of a running server with concurrent applicants, registrars and "
+        "registrars in charge, and report throughput and p50/p95/p99 latency per endpoint. "
+        "Seed the server's database first (`manage.py seed_data`); the write endpoints use up "
+        "pending, submitted and assigned applications, so reseed between comparable runs. "
+        "Serve with an ASGI server (e.g. `uvicorn project.asgi:application`) so the async/ "
+        "routes run natively."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint.")
+        parser.add_argument(
+            "--heavy-requests", type=int, default=None,
+            help="Requests for login, export and latency (default: a tenth of --requests).",
+        )
+        parser.add_argument("--users", type=int, default=20, help="Distinct users per role.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--only", action="append", default=[],
+            help="Run only endpoints whose name contains this text (repeatable).",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+        parser.add_argument(
+            "--max-regression", type=float, default=20.0,
+            help="Fail when an endpoint's p95 is this many percent above the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.headers = {}
+        self.lock = threading.Lock()
+        requests = options["requests"]
+        heavy = options["heavy_requests"] or max(requests // 10, 1)
+        self.prepare(requests, options["users"])
+
+        base = options["base_url"].rstrip("/") + "/"
+        results = {}
+        self.stdout.write(
+            f"{'endpoint':<48} {'req':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for name, is_heavy, make_request, on_response in self.endpoints():
+            if options["only"] and not any(part in name for part in options["only"]):
+                continue
+            result = drive(
+                base, make_request, concurrency=options["concurrency"],
+                requests=heavy if is_heavy else requests, on_response=on_response,
+            )
+            results[name] = {key: round(value, 2) for key, value in result.items()}
+            self.stdout.write(
+                f"{name:<48} {result['requests']:>5} {result['rps']:>8.1f} {result['p50']:>8.1f} "
+                f"{result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}"
+            )
+
+        report = {
+            "meta": {
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "base_url": options["base_url"],
+                "concurrency": options["concurrency"],
+                "requests": requests,
+                "heavy_requests": heavy,
+                "seed": options["seed"],
+                "applications": OfficialSearchApplication.objects.count(),
+            },
+            "endpoints": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["max_regression"])
+
+    def prepare(self, requests, users):
+        """Pick the users and applications each endpoint works on."""
+        login_user, _ = User.objects.get_or_create(
+            username=LOGIN_USERNAME, defaults={"county": REGISTRIES[0], "role": "normal"}
+        )
+        login_user.set_password(LOGIN_PASSWORD)
+        login_user.save()
+
+        pending = list(
+            OfficialSearchApplication.objects.filter(status="pending").order_by("id")
+            .values_list("id", "applicant_id")[:requests]
+        )
+        self.applicants = list(dict.fromkeys(applicant for _, applicant in pending))[:users] or [login_user.pk]
+        self.pending = Pool(pending)
+        self.certificates = list(
+            Certificate.objects.filter(application__applicant_id__in=self.applicants)
+            .values_list("id", "application__applicant_id")[:requests]
+        )
+
+        self.in_charge = list(
+            User.objects.filter(role="is_registrar_in_charge").order_by("id").values_list("id", "registry")[:users]
+        )
+        registries = {registry for _, registry in self.in_charge}
+        registrars = {}
+        for registrar, registry in User.objects.filter(role="is_registrar", registry__in=registries).values_list(
+            "id", "registry"
+        ):
+            registrars.setdefault(registry, []).append(registrar)
+        submitted = list(
+            OfficialSearchApplication.objects.filter(status="submitted", registry__in=registries)
+            .order_by("id").values_list("id", "registry")[:requests * (BULK_SIZE + 1)]
+        )
+        by_registry = {}
+        for app_id, registry in submitted:
+            by_registry.setdefault(registry, []).append(app_id)
+        in_charge_of = dict((registry, ric) for ric, registry in self.in_charge)
+        single, bulk = [], []
+        for registry, ids in by_registry.items():
+            if not registrars.get(registry):
+                continue
+            ric, choices = in_charge_of[registry], registrars[registry]
+            # as many single assignments as bulk ones
+            singles = len(ids) // (BULK_SIZE + 1)
+            single += [(ric, app_id, self.rng.choice(choices)) for app_id in ids[:singles]]
+            bulk += [
+                (ric, ids[i:i + BULK_SIZE], self.rng.choice(choices))
+                for i in range(singles, len(ids), BULK_SIZE)
+            ]
+        self.rng.shuffle(single)
+        self.rng.shuffle(bulk)
+        self.assign, self.assign_bulk = Pool(single), Pool(bulk)
+
+        assigned = list(
+            OfficialSearchApplication.objects.filter(status="assigned").order_by("id")
+            .values_list("id", "assigned_to_id")[:requests * 2]
+        )
+        self.registrars = list(dict.fromkeys(registrar for _, registrar in assigned))[:users]
+        self.reject = Pool(assigned[:requests])
+        self.upload_targets = Pool(assigned[requests:])
+        self.uploads, self.written, self.completed = Pool(), Pool(), Pool()
+        self.upload_items = {}
+
+    def auth(self, user_id, **extra):
+        with self.lock:
+            if user_id not in self.headers:
+                token = tokens_for_user(User.objects.get(pk=user_id)).access_token
+                self.headers[user_id] = {"Authorization": f"Bearer {token}"}
+        return {**self.headers[user_id], **extra}
+
+    def json_request(self, method, path, user_id, data):
+        headers = {"Content-Type": "application/json"}
+        if user_id is not None:
+            headers = self.auth(user_id, **headers)
+        return method, path, headers, json.dumps(data).encode()
+
+    def get(self, users, path):
+        """GET `path` (a string, or a callable returning (user, path)) as one of `users`."""
+        def make_request():
+            if callable(path):
+                item = path()
+                if item is None:
+                    return None
+                user_id, url = item
+            else:
+                if not users:
+                    return None
+                user_id, url = self.rng.choice(users), path
+            return "GET", url, self.auth(user_id), None
+        return make_request
+
+    def endpoints(self):
+        """(name, heavy, make_request, on_response) for every route in app/urls.py."""
+        rng = self.rng
+        in_charge = [ric for ric, _ in self.in_charge]
+
+        def certificate(template):
+            def pick():
+                if not self.certificates:
+                    return None
+                pk, applicant = rng.choice(self.certificates)
+                return applicant, template.format(pk)
+            return pick
+
+        def login():
+            return self.json_request("POST", "login", None, {"username": LOGIN_USERNAME, "password": LOGIN_PASSWORD})
+
+        def create():
+            registry = rng.choice(REGISTRIES)
+            return self.json_request(
+                "POST", "applications/create", rng.choice(self.applicants), new_application(rng, registry)
+            )
+
+        def bulk_create():
+            return self.json_request(
+                "POST", "applications/bulk-create", rng.choice(self.applicants),
+                [new_application(rng, rng.choice(REGISTRIES)) for _ in range(BULK_SIZE)],
+            )
+
+        def pay():
+            item = self.pending.take()
+            if item is None:
+                return None
+            app_id, applicant = item
+            return self.json_request("POST", f"applications/{app_id}/pay", applicant, {"amount": 1050})
+
+        def assign():
+            item = self.assign.take()
+            if item is None:
+                return None
+            ric, app_id, registrar = item
+            return self.json_request(
+                "POST", f"registrar-in-charge/assign/{app_id}", ric, {"registrar_id": registrar}
+            )
+
+        def assign_bulk():
+            item = self.assign_bulk.take()
+            if item is None:
+                return None
+            ric, app_ids, registrar = item
+            return self.json_request(
+                "POST", "registrar-in-charge/assign-bulk", ric,
+                {"registrar_id": registrar, "application_ids": app_ids},
+            )
+
+        def reject():
+            item = self.reject.take()
+            if item is None:
+                return None
+            app_id, registrar = item
+            return self.json_request(
+                "POST", f"registrar/reject/{app_id}", registrar, {"comment": "Rejected by load test."}
+            )
+
+        # the resumable certificate upload flow: create, PUT the file, check, complete, approve
+        def upload_create():
+            item = self.upload_targets.take()
+            if item is None:
+                return None
+            app_id, registrar = item
+            return self.json_request(
+                "POST", f"registrar/approve/{app_id}/uploads", registrar,
+                {"filename": "certificate.pdf", "size": len(CERTIFICATE), "sha256": CERTIFICATE_SHA256},
+            )
+
+        def upload_created(spec, body):
+            _, path, headers, _ = spec
+            item = (int(path.split("/")[2]), headers, json.loads(body)["id"])
+            self.upload_items[item[2]] = item
+            self.uploads.put(item)
+
+        def upload_put():
+            item = self.uploads.take()
+            if item is None:
+                return None
+            _, headers, upload_id = item
+            return "PUT", f"registrar/uploads/{upload_id}", {
+                "Authorization": headers["Authorization"],
+                "Content-Type": "application/octet-stream",
+                "Content-Range": f"bytes 0-{len(CERTIFICATE) - 1}/{len(CERTIFICATE)}",
+                "X-Chunk-SHA256": CERTIFICATE_SHA256,
+            }, CERTIFICATE
+
+        def upload_get():
+            item = self.written.sample(rng)
+            if item is None:
+                return None
+            _, headers, upload_id = item
+            return "GET", f"registrar/uploads/{upload_id}", {"Authorization": headers["Authorization"]}, None
+
+        def upload_complete():
+            item = self.written.take()
+            if item is None:
+                return None
+            _, headers, upload_id = item
+            return "POST", f"registrar/uploads/{upload_id}/complete", {"Authorization": headers["Authorization"]}, None
+
+        def approve():
+            item = self.completed.take()
+            if item is None:
+                return None
+            app_id, headers, upload_id = item
+            return "POST", f"registrar/approve/{app_id}", headers, json.dumps({"upload_id": upload_id}).encode()
+
+        def moved_to(pool):
+            # PUT and complete paths are registrar/uploads/<uuid>[/complete]
+            return lambda spec, body: pool.put(self.upload_items[spec[1].split("/")[2]])
+
+        return [
+            ("POST login", True, login, None),
+            ("GET users", False, self.get(self.applicants, "users"), None),
+            # applicant
+            ("GET applications", False, self.get(self.applicants, "applications"), None),
+            ("GET certificates/<pk>", False, self.get(None, certificate("certificates/{}")), None),
+            ("GET certificates/<pk>/file", False, self.get(None, certificate("certificates/{}/file")), None),
+            # registrar in charge
+            ("GET registrar-in-charge/submitted", False, self.get(in_charge, "registrar-in-charge/submitted"), None),
+            ("GET registrar-in-charge/dashboard", False, self.get(in_charge, "registrar-in-charge/dashboard"), None),
+            ("GET registrar-in-charge/export", True, self.get(in_charge, "registrar-in-charge/export"), None),
+            ("GET registrar-in-charge/latency", True, self.get(in_charge, "registrar-in-charge/latency"), None),
+            # registrar
+            ("GET registrar/assigned", False, self.get(self.registrars, "registrar/assigned"), None),
+            # async twins of the read endpoints
+            ("GET async/applications", False, self.get(self.applicants, "async/applications"), None),
+            ("GET async/certificates/<pk>/file", False,
+             self.get(None, certificate("async/certificates/{}/file")), None),
+            ("GET async/registrar-in-charge/submitted", False,
+             self.get(in_charge, "async/registrar-in-charge/submitted"), None),
+            ("GET async/registrar/assigned", False, self.get(self.registrars, "async/registrar/assigned"), None),
+            # writes last, so the reads above all see the same dataset
+            ("POST applications/create", False, create, None),
+            ("POST applications/bulk-create", False, bulk_create, None),
+            ("POST applications/<id>/pay", False, pay, None),
+            ("POST registrar-in-charge/assign/<id>", False, assign, None),
+            ("POST registrar-in-charge/assign-bulk", False, assign_bulk, None),
+            ("POST registrar/reject/<id>", False, reject, None),
+            ("POST registrar/approve/<id>/uploads", False, upload_create, upload_created),
+            ("PUT registrar/uploads/<uuid>", False, upload_put, moved_to(self.written)),
+            ("GET registrar/uploads/<uuid>", False, upload_get, None),
+            ("POST registrar/uploads/<uuid>/complete", False, upload_complete, moved_to(self.completed)),
+            ("POST registrar/approve/<id>", False, approve, None),
+        ]
+
+    def compare(self, results, path, max_regression):
+        with open(path) as f:
+            baseline = json.load(f)["endpoints"]
+        self.stdout.write(f"\n{'endpoint':<48} {'p95 before':>11} {'p95 now':>9} {'change':>8}")
+        regressed = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before or not before["p95"]:
+                continue
+            change = (result["p95"] - before["p95"]) / before["p95"] * 100
+            self.stdout.write(f"{name:<48} {before['p95']:>11.1f} {result['p95']:>9.1f} {change:>+7.0f}%")
+            if change > max_regression:
+                regressed.append(name)
+        if regressed:
+            raise CommandError(
+                f"p95 latency regressed more than {max_regression:.0f}% on: {', '.join(regressed)}"
+            )
+
+
+def new_application(rng, registry):
+    return {
+        "parcel_number": f"{registry.upper().replace(' ', '')}/BLOCK{rng.randint(1, 400)}/{rng.randint(1, 99999)}",
+        "purpose": "Official search",
+        "county": registry,
+        "registry": registry,
+    }
@@ -0,0 +1,54 @@
+import json
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI-style) and async read endpoints of a running server under "
+        "concurrent load. Start the server first, e.g. `uvicorn project.asgi:application "
+        "--workers 1`, and pass credentials for a user that can read the chosen paths."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="Sync path to compare against its async/ twin (repeatable). Default: applications.",
+        )
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        base = options["base_url"].rstrip("/")
+        headers = {"Authorization": f"Bearer {self.login(base, options['username'], options['password'])}"}
+
+        self.stdout.write(f"{'endpoint':<45} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for path in options["paths"] or ["applications"]:
+            path = path.strip("/")
+            for label in (path, f"async/{path}"):
+                result = run_load(
+                    f"{base}/{label}", headers,
+                    concurrency=options["concurrency"], requests=options["requests"],
+                )
+                self.stdout.write(
+                    f"{label:<45} {result['rps']:>8.1f} {result['p50']:>8.1f} "
+                    f"{result['p95']:>8.1f} {result['errors']:>7}"
+                )
+
+    def login(self, base, username, password):
+        request = urllib.request.Request(
+            f"{base}/login",
+            data=json.dumps({"username": username, "password": password}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return json.load(response)["access"]
+        except OSError as exc:
+            raise CommandError(f"Could not log in at {base}/login: {exc}")
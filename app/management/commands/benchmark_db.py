@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from app.benchmark import run_mixed, seed_applications
+from app.models import OfficialSearchApplication
+
+# what a fresh SQLite file gets without SQLITE_PRAGMAS (python's sqlite3 waits 5 s on a lock)
+SQLITE_DEFAULT_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "busy_timeout": 5000,
+    "synchronous": "FULL",
+    "mmap_size": 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and measure mixed read/write throughput from concurrent "
+        "workers under the default and the configured connection settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--seconds", type=int, default=10)
+        parser.add_argument("--write-share", type=float, default=0.2)
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **options):
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        if connection.vendor == "sqlite" and not test_settings.get("NAME"):
+            # worker threads need a shared on-disk file, not per-connection memory databases
+            test_settings["NAME"] = str(settings.BASE_DIR / "benchmark.sqlite3")
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            existing = OfficialSearchApplication.objects.count()
+            if existing < options["rows"]:
+                self.stdout.write(f"Seeding {options['rows'] - existing} applications...")
+                seed_applications(options["rows"] - existing, log=self.stdout.write)
+            self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+    def profiles(self):
+        if connection.vendor == "sqlite":
+            return [
+                ("default pragmas, connection per request", SQLITE_DEFAULT_PRAGMAS, True),
+                ("SQLITE_PRAGMAS, connection per request", settings.SQLITE_PRAGMAS, True),
+                ("SQLITE_PRAGMAS, persistent connections", settings.SQLITE_PRAGMAS, False),
+            ]
+        return [
+            ("connection per request", None, True),
+            ("persistent connections", None, False),
+        ]
+
+    def run_benchmark(self, options):
+        self.stdout.write(
+            f"{options['workers']} workers, {options['seconds']} s, "
+            f"{options['write_share']:.0%} writes on {connection.vendor}"
+        )
+        self.stdout.write(
+            f"{'profile':<42} {'reads/s':>8} {'r p95':>7} {'writes/s':>9} {'w p95':>7} {'locked':>7}"
+        )
+        for label, pragmas, reconnect in self.profiles():
+            connection.close()
+            with override_settings(**({"SQLITE_PRAGMAS": pragmas} if pragmas is not None else {})):
+                result = run_mixed(
+                    workers=options["workers"], seconds=options["seconds"],
+                    write_share=options["write_share"], reconnect=reconnect,
+                )
+            read, write = result["read"], result["write"]
+            self.stdout.write(
+                f"{label:<42} {read['ops_per_s']:>8.1f} {read['p95']:>7.1f} "
+                f"{write['ops_per_s']:>9.1f} {write['p95']:>7.1f} {result['locked']:>7}"
+            )
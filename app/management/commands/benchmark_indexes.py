@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.benchmark import seed_applications, time_call
+from app.models import OfficialSearchApplication
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and report query plans and latency of the application "
+        "list queries with and without the OfficialSearchApplication indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the benchmark database so later runs can skip seeding.",
+        )
+
+    def handle(self, *args, **options):
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        if connection.vendor == "sqlite" and not test_settings.get("NAME"):
+            # an on-disk file, so the numbers reflect real page reads
+            test_settings["NAME"] = str(settings.BASE_DIR / "benchmark.sqlite3")
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            existing = OfficialSearchApplication.objects.count()
+            if existing < options["rows"]:
+                self.stdout.write(f"Seeding {options['rows'] - existing} applications...")
+                seed_applications(
+                    options["rows"] - existing, batch_size=options["batch_size"], log=self.stdout.write
+                )
+            self.run_benchmark(options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+    def queries(self):
+        sample = OfficialSearchApplication.objects.exclude(assigned_to=None).order_by("id").first()
+        registry, registrar, applicant = sample.registry, sample.assigned_to_id, sample.applicant_id
+        ordering = ("submitted_at", "id")
+        apps = OfficialSearchApplication.objects
+        return [
+            ("registrar-in-charge/submitted",
+             apps.exclude(status="pending").filter(registry=registry).order_by(*ordering)),
+            ("registrar-in-charge/submitted?status=submitted",
+             apps.exclude(status="pending").filter(registry=registry, status="submitted").order_by(*ordering)),
+            ("registrar/assigned",
+             apps.filter(assigned_to=registrar).order_by(*ordering)),
+            ("registrar/assigned?status=assigned",
+             apps.filter(assigned_to=registrar, status="assigned").order_by(*ordering)),
+            ("applications",
+             apps.filter(applicant=applicant).order_by(*ordering)),
+        ]
+
+    def measure(self, label, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label} =="))
+        for name, queryset in self.queries():
+            page = queryset[:5]
+            page_ms, page_max = time_call(lambda: list(page.all()), repeat)
+            count_ms, count_max = time_call(queryset.count, repeat)
+            self.stdout.write(self.style.SUCCESS(name))
+            for line in page.explain().splitlines():
+                self.stdout.write(f"    {line}")
+            self.stdout.write(
+                f"    page: {page_ms:.2f} ms median / {page_max:.2f} ms max   "
+                f"count: {count_ms:.2f} ms median / {count_max:.2f} ms max"
+            )
+
+    def run_benchmark(self, repeat):
+        model = OfficialSearchApplication
+        total = model.objects.count()
+        self.stdout.write(f"{total} applications on {connection.vendor}")
+        with connection.schema_editor() as editor:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+        self.measure("without access-path indexes", repeat)
+        with connection.schema_editor() as editor:
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+        if connection.vendor == "sqlite":
+            connection.cursor().execute("ANALYZE")
+        self.measure("with access-path indexes", repeat)
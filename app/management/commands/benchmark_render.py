@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from app import compression
+from app.benchmark import seed_applications, time_call
+from app.models import OfficialSearchApplication
+from app.renderers import ORJSONRenderer, orjson
+from app.serializers import ApplicationSerializer
+
+PAGE_SIZES = (5, 50, 500)
+TRIMMED_FIELDS = ("reference_number", "parcel_number", "status")
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, then measure application list payloads: JSON rendering "
+        "time with DRF's renderer and ORJSONRenderer, and CPU time against bytes saved for "
+        "each gzip level and brotli quality."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the benchmark database so later runs can skip seeding.",
+        )
+
+    def handle(self, *args, **options):
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        if connection.vendor == "sqlite" and not test_settings.get("NAME"):
+            test_settings["NAME"] = str(settings.BASE_DIR / "benchmark.sqlite3")
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            existing = OfficialSearchApplication.objects.count()
+            if existing < options["rows"]:
+                self.stdout.write(f"Seeding {options['rows'] - existing} applications...")
+                seed_applications(options["rows"] - existing, log=self.stdout.write, related=True)
+            self.run_benchmark(options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+    def payloads(self):
+        # completed applications carry all three nested relations, the worst case
+        applications = list(
+            OfficialSearchApplication.objects.filter(status="completed").order_by("id").with_related()[:max(PAGE_SIZES)]
+        )
+        for size in PAGE_SIZES:
+            results = ApplicationSerializer(applications[:size], many=True).data
+            page = {"count": len(applications), "next": None, "previous": None}
+            yield f"{size} full", {**page, "results": results}
+            yield f"{size} ?fields=", {
+                **page, "results": [{name: row[name] for name in TRIMMED_FIELDS} for row in results]
+            }
+
+    def run_benchmark(self, repeat):
+        payloads = list(self.payloads())
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\n== rendering (median ms) =="))
+        if orjson is None:
+            self.stdout.write("orjson is not installed; ORJSONRenderer falls back to DRF's renderer.")
+        self.stdout.write(f"{'page':<14} {'bytes':>8} {'DRF json':>9} {'orjson':>8} {'speedup':>8}  same output")
+        stdlib, fast = JSONRenderer(), ORJSONRenderer()
+        rendered = {}
+        for label, data in payloads:
+            slow_ms, _ = time_call(lambda: stdlib.render(data), repeat)
+            fast_ms, _ = time_call(lambda: fast.render(data), repeat)
+            rendered[label] = fast.render(data)
+            same = rendered[label] == stdlib.render(data)
+            self.stdout.write(
+                f"{label:<14} {len(rendered[label]):>8} {slow_ms:>9.3f} {fast_ms:>8.3f} "
+                f"{slow_ms / fast_ms if fast_ms else 0:>7.1f}x  {'yes' if same else 'NO'}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\n== compression (median ms, bytes, saved) =="))
+        codecs = [("gzip", level) for level in GZIP_LEVELS]
+        if compression.brotli is not None:
+            codecs += [("br", quality) for quality in BROTLI_QUALITIES]
+        else:
+            self.stdout.write("brotli is not installed; only gzip is measured.")
+        self.stdout.write(f"{'page':<14} " + " ".join(f"{f'{name}-{level}':>22}" for name, level in codecs))
+        for label, body in rendered.items():
+            if len(body) < compression.min_size():
+                label += " *"
+            cells = []
+            for name, level in codecs:
+                ms, _ = time_call(lambda: compression.compress(body, name, level), repeat)
+                size = len(compression.compress(body, name, level))
+                cells.append(f"{ms:>6.2f} {size:>7} {1 - size / len(body):>6.0%}")
+            self.stdout.write(f"{label:<14} " + " ".join(f"{cell:>22}" for cell in cells))
+        self.stdout.write(
+            f"* below COMPRESSION_MIN_SIZE ({compression.min_size()} bytes): sent uncompressed"
+        )
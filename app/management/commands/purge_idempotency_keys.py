@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records whose replay window (or in-flight lock) has expired."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(f"Deleted {deleted} expired idempotency records.")
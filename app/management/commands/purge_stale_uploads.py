@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = "Delete resumable certificate uploads older than CHUNKED_UPLOAD_TTL, with their part files."
+
+    def handle(self, *args, **options):
+        deleted = purge_stale()
+        self.stdout.write(f"Deleted {deleted} abandoned uploads.")
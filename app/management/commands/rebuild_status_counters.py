@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app import counters
+from app.models import RegistryStatusCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-registry status counters from the applications table."
+
+    def handle(self, *args, **options):
+        counters.rebuild()
+        self.stdout.write(f"Rebuilt {RegistryStatusCounter.objects.count()} registry/status counters.")
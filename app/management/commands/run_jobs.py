@@ -0,0 +1,55 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (app.jobs) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Worker threads.")
+        parser.add_argument(
+            "--interval", type=float, default=1.0,
+            help="Seconds an idle worker waits before polling the queue again.",
+        )
+        parser.add_argument(
+            "--burst", action="store_true",
+            help="Exit once the queue has no due jobs instead of polling forever.",
+        )
+        parser.add_argument("--worker-id", help="Name recorded on claimed jobs. Defaults to host:pid.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        processed = []
+
+        prefix = options["worker_id"] or Worker().worker_id
+
+        def work(n):
+            worker = Worker(f"{prefix}-{n}")
+            try:
+                while not stop.is_set():
+                    if worker.run_one():
+                        processed.append(n)
+                    elif options["burst"]:
+                        return
+                    else:
+                        stop.wait(options["interval"])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(n,), daemon=True) for n in range(options["concurrency"])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the jobs in progress...")
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(f"Ran {len(processed)} job(s).")
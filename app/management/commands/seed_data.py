@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.benchmark import seed_applications
+from app.models import ApplicationEvent, Certificate, OfficialSearchApplication, Payment, Review
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the configured database with a synthetic dataset for load testing: applications "
+        "spread over the registries and statuses, with their applicants, registrars, payments, "
+        "certificates, reviews and status events. The same --seed gives the same dataset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--applications", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        seed_applications(
+            options["applications"], batch_size=options["batch_size"], seed=options["seed"],
+            log=self.stdout.write, related=True,
+        )
+        self.stdout.write(f"Done in {time.perf_counter() - start:.0f} s. Table sizes now:")
+        for model in (OfficialSearchApplication, Payment, Certificate, Review, ApplicationEvent):
+            self.stdout.write(f"  {model._meta.db_table:<40} {model.objects.count():>10}")
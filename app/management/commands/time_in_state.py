@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.latency import GROUPS, time_in_state
+
+
+class Command(BaseCommand):
+    help = "Report p50/p95 time spent in each application status, per registry or per registrar."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", choices=sorted(GROUPS), default="registry")
+        parser.add_argument("--registry", help="Only this registry.")
+        parser.add_argument("--days", type=int, default=30, help="Intervals that ended in the last DAYS days.")
+
+    def handle(self, *args, **options):
+        group = options["group"]
+        since = timezone.now() - timedelta(days=options["days"])
+        rows = time_in_state(group, registry=options["registry"], since=since)
+        self.stdout.write(f"{group:<25} {'status':<12} {'count':>8} {'p50':>12} {'p95':>12}")
+        for row in rows:
+            self.stdout.write(
+                f"{str(row[group]):<25} {row['status']:<12} {row['count']:>8} "
+                f"{self.duration(row['p50_seconds']):>12} {self.duration(row['p95_seconds']):>12}"
+            )
+
+    def duration(self, seconds):
+        hours, rest = divmod(int(seconds), 3600)
+        return f"{hours}h{rest // 60:02d}m{rest % 60:02d}s"
@@ -0,0 +1,161 @@
+"""
+In-process request metrics in Prometheus text format, without a client library.
+
+MetricsMiddleware times every request and labels it with the matched URL route. The SQL
+query count and time come from an execute wrapper installed on every database connection
+(see app.apps), which adds to the collector of the request in the current context. The
+collector lives in a ContextVar, so queries run from sync_to_async threads under ASGI are
+counted against the right request. Each process keeps its own numbers; scrape every
+worker, or run one per container.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = ContextVar("metrics_request", default=None)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        # per-bucket counts; made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self.series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            label_text = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = dict(self.series)
+        for labels, value in sorted(series.items()):
+            lines.append(f"{self.name}{{{format_labels(label_names, labels)}}} {value}")
+        return lines
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+VIEW_LABELS = ("view", "method")
+
+requests_total = Counter("http_requests_total", "Requests handled, by view, method and status code.")
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time from the request entering the middleware to its response.",
+    LATENCY_BUCKETS,
+)
+request_queries = Histogram("http_request_db_queries", "SQL queries run per request.", QUERY_COUNT_BUCKETS)
+request_query_time = Histogram(
+    "http_request_db_duration_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS
+)
+response_size = Histogram(
+    "http_response_size_bytes", "Response body size, when known up front.", SIZE_BUCKETS
+)
+
+
+class RequestCollector:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+def start_request():
+    """Begin collecting SQL stats for the current context; returns (collector, token)."""
+    collector = RequestCollector()
+    return collector, _current.set(collector)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def query_recorder(execute, sql, params, many, context):
+    """Database execute wrapper that adds each query to the current request's collector."""
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.queries += 1
+        collector.query_seconds += time.perf_counter() - start
+
+
+def install(connection):
+    if query_recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_recorder)
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unmatched>"
+    return match.view_name if match.url_name else match.route
+
+
+def record(request, response, collector, seconds):
+    labels = (view_label(request), request.method)
+    requests_total.inc(labels + (str(response.status_code),))
+    request_duration.observe(labels, seconds)
+    request_queries.observe(labels, collector.queries)
+    request_query_time.observe(labels, collector.query_seconds)
+    if not response.streaming:
+        response_size.observe(labels, len(response.content))
+    elif response.has_header("Content-Length"):
+        response_size.observe(labels, int(response["Content-Length"]))
+
+
+def render():
+    lines = requests_total.render(VIEW_LABELS + ("status",))
+    for histogram in (request_duration, request_queries, request_query_time, response_size):
+        lines.extend(histogram.render(VIEW_LABELS))
+    return "\n".join(lines) + "\n"
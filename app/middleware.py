@@ -0,0 +1,159 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from . import compression, metrics
+from .authentication import token_user_id
+from .routers import ais_sticky, amark_sticky, is_sticky, mark_sticky, pin_to_primary, unpin
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Keep a request's reads on the primary when it writes, when its view opts out of the
+    replica (read_from_primary = True), or when the same user wrote moments ago; every
+    other request reads from the replica. The choice is made in process_view, from the view
+    Django has already resolved, and the bearer token it decodes stays on the request for
+    the authentication classes (see app.authentication.request_token).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django runs process_view in the handler's mode; a sync one would cost a thread hop
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.unpin_request(request)
+        user_id = self.writer_id(request, response)
+        if user_id is not None:
+            mark_sticky(user_id)
+        return response
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.unpin_request(request)
+        user_id = self.writer_id(request, response)
+        if user_id is not None:
+            await amark_sticky(user_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.view_reads_from_primary(request, view_func):
+            self.pin_request(request)
+            return
+        user_id = token_user_id(request)
+        if user_id is not None and is_sticky(user_id):
+            self.pin_request(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.view_reads_from_primary(request, view_func):
+            self.pin_request(request)
+            return
+        user_id = token_user_id(request)
+        if user_id is not None and await ais_sticky(user_id):
+            self.pin_request(request)
+
+    def view_reads_from_primary(self, request, view_func):
+        if request.method not in SAFE_METHODS:
+            return True
+        view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+        return getattr(view_class, "read_from_primary", False)
+
+    def pin_request(self, request):
+        request._primary_pin = pin_to_primary()
+
+    def unpin_request(self, request):
+        token = request.__dict__.pop("_primary_pin", None)
+        if token is not None:
+            unpin(token)
+
+    def writer_id(self, request, response):
+        """The user whose successful write this was, to keep their next reads on the primary."""
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        return token_user_id(request)
+
+
+class MetricsMiddleware:
+    """Record latency, SQL query count/time and response size per route (see app.metrics)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        collector, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        metrics.record(request, response, collector, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        collector, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        metrics.record(request, response, collector, time.perf_counter() - start)
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress large JSON API responses with brotli or gzip as the client negotiates (see
+    app.compression). JSON views holding secrets next to request input (login) opt out with
+    compress_response = False, which keeps them out of reach of BREACH-style guessing.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or not 200 <= response.status_code < 300 or response.status_code in (204, 206):
+            return response
+        if response.has_header("Content-Encoding") or not compression.is_compressible(response.get("Content-Type", "")):
+            return response
+        match = getattr(request, "resolver_match", None)
+        view_class = match and (getattr(match.func, "cls", None) or getattr(match.func, "view_class", None))
+        if not getattr(view_class, "compress_response", True):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < compression.min_size():
+            return response
+        encoding = compression.choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None:
+            return response
+        compressed = compression.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        # the bytes differ from the uncompressed body, so a strong ETag becomes weak
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -0,0 +1,49 @@
+# reference_number was added to the model without a migration; existing rows
+# get a unique reference before the unique constraint is applied.
+
+from django.db import migrations, models
+import random
+import string
+
+
+def generate_reference_number():
+    characters = string.ascii_uppercase + string.digits
+    return "SRCH" + "".join(random.choices(characters, k=6))
+
+
+def populate_reference_numbers(apps, schema_editor):
+    OfficialSearchApplication = apps.get_model("app", "OfficialSearchApplication")
+    used = set()
+    for application in OfficialSearchApplication.objects.filter(reference_number__isnull=True):
+        ref = generate_reference_number()
+        while ref in used:
+            ref = generate_reference_number()
+        used.add(ref)
+        application.reference_number = ref
+        application.save(update_fields=["reference_number"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_alter_officialsearchapplication_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='officialsearchapplication',
+            name='reference_number',
+            field=models.CharField(editable=False, max_length=10, null=True),
+        ),
+        migrations.RunPython(populate_reference_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='officialsearchapplication',
+            name='reference_number',
+            field=models.CharField(editable=False, max_length=10, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='officialsearchapplication',
+            name='status',
+            field=models.CharField(choices=[('submitted', 'Submitted'), ('assigned', 'Assigned'), ('verified', 'Verified'), ('rejected', 'Rejected'), ('completed', 'Completed'), ('pending', 'Pending')], default='pending', max_length=20),
+        ),
+    ]
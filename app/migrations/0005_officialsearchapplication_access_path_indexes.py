@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_officialsearchapplication_reference_number'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='officialsearchapplication',
+            index=models.Index(condition=models.Q(('status', 'pending'), _negated=True), fields=['registry', 'submitted_at'], name='app_osa_registry_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officialsearchapplication',
+            index=models.Index(condition=models.Q(('status', 'pending'), _negated=True), fields=['registry', 'status', 'submitted_at'], name='app_osa_registry_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officialsearchapplication',
+            index=models.Index(fields=['assigned_to', 'status', 'submitted_at'], name='app_osa_assigned_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officialsearchapplication',
+            index=models.Index(fields=['applicant', 'submitted_at'], name='app_osa_applicant_sub_idx'),
+        ),
+    ]
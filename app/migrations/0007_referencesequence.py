@@ -0,0 +1,46 @@
+# Generated by Django 4.2.24 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+from app import references
+
+
+def seed_reference_sequence(apps, schema_editor):
+    OfficialSearchApplication = apps.get_model("app", "OfficialSearchApplication")
+    ReferenceSequence = apps.get_model("app", "ReferenceSequence")
+    # the odd random reference issued before the allocator may happen to carry a valid check character
+    reserved = sorted(
+        number
+        for number in map(references.decode, OfficialSearchApplication.objects.values_list("reference_number", flat=True))
+        if number is not None
+    )
+    ReferenceSequence.objects.create(name=references.SEQUENCE_NAME, reserved=reserved)
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS {references.PG_SEQUENCE} "
+            f"MINVALUE 0 START WITH 0 INCREMENT BY {references.BLOCK_SIZE}"
+        )
+
+
+def drop_reference_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {references.PG_SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_application_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=0)),
+                ('reserved', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+        migrations.RunPython(seed_reference_sequence, drop_reference_sequence),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.24 on 2026-10-18 16:50
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    OfficialSearchApplication = apps.get_model("app", "OfficialSearchApplication")
+    RegistryStatusCounter = apps.get_model("app", "RegistryStatusCounter")
+    rows = OfficialSearchApplication.objects.order_by().values("registry", "status").annotate(total=Count("id"))
+    RegistryStatusCounter.objects.bulk_create(
+        RegistryStatusCounter(registry=row["registry"], status=row["status"], count=row["total"])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_certificateupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistryStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registry', models.CharField(max_length=100)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='registrystatuscounter',
+            constraint=models.UniqueConstraint(fields=('registry', 'status'), name='app_registry_status_counter_uniq'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
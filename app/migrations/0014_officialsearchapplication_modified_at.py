@@ -0,0 +1,26 @@
+# Generated by Django 4.2.24 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_applicationevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='officialsearchapplication',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='officialsearchapplication',
+            index=models.Index(condition=models.Q(('status', 'pending'), _negated=True), fields=['registry', 'status', 'modified_at'], name='app_osa_registry_modified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='officialsearchapplication',
+            index=models.Index(fields=['assigned_to', 'modified_at'], name='app_osa_assigned_modified_idx'),
+        ),
+    ]
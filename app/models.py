@@ -1,17 +1,15 @@
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
+from django.utils import timezone
 from django.utils.crypto import get_random_string
-import string, random
+from .references import allocate_reference_numbers
 
 
-def generate_reference_number():
-    prefix = "SRCH"
-    length = 6  
-    characters = string.ascii_uppercase + string.digits
-    return prefix + ''.join(random.choices(characters, k=length))
-
 class CustomUserManager(BaseUserManager):
     def create_user(self, username, password=None, county=None, registry=None, role="normal"):
         if not username:
@@ -43,16 +41,76 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # bumped whenever a field carried in token claims changes, revoking older tokens
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = CustomUserManager()
 
     USERNAME_FIELD = "username"
     REQUIRED_FIELDS = ["county"]
+    TOKEN_CLAIM_FIELDS = ("username", "role", "registry", "county", "password", "is_active")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._claim_snapshot = user._claim_values()
+        return user
+
+    def _claim_values(self):
+        loaded = self.__dict__
+        return {field: loaded[field] for field in self.TOKEN_CLAIM_FIELDS if field in loaded}
+
+    def save(self, *args, **kwargs):
+        snapshot = getattr(self, "_claim_snapshot", None)
+        revoke = bool(snapshot) and any(getattr(self, field) != value for field, value in snapshot.items())
+        if revoke:
+            self.token_version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "token_version"}
+        super().save(*args, **kwargs)
+        self._claim_snapshot = self._claim_values()
+        if revoke:
+            from .authentication import version_cache_key
+            from django.core.cache import cache
+            transaction.on_commit(lambda: cache.delete(version_cache_key(self.pk)))
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
 
+# what ApplicationSerializer nests under each application
+APPLICATION_RELATIONS = ("certificate", "payment", "reviews")
+
+
+class OfficialSearchApplicationQuerySet(models.QuerySet):
+    def with_related(self, relations=APPLICATION_RELATIONS):
+        # load what ApplicationSerializer nests in a fixed number of queries: one joined query
+        # for certificate/payment, one more for all the reviews; `relations` narrows it down
+        queryset = self
+        joined = [name for name in ("certificate", "payment") if name in relations]
+        if joined:
+            queryset = queryset.select_related(*joined)
+        if "reviews" in relations:
+            queryset = queryset.prefetch_related("reviews")
+        return queryset
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        missing = [obj for obj in objs if not obj.reference_number]
+        references = allocate_reference_numbers(len(missing), using=self.db) if missing else []
+        for obj, reference in zip(missing, references):
+            obj.reference_number = reference
+        from . import counters
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            totals = {}
+            for obj in created:
+                totals[obj.registry, obj.status] = totals.get((obj.registry, obj.status), 0) + 1
+            for (registry, status), count in totals.items():
+                counters.record_created(registry, status, count)
+        return created
+
+
 class OfficialSearchApplication(models.Model):
     STATUS_CHOICES = [
         ("submitted", "Submitted"),
@@ -84,20 +142,84 @@ class OfficialSearchApplication(models.Model):
         on_delete=models.SET_NULL,
         related_name="assigned_applications"
     )
+    # bumped by every save and status transition; list views derive their ETags from it
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = OfficialSearchApplicationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # registrar-in-charge queue: own registry, everything except unpaid, oldest first
+            models.Index(
+                fields=["registry", "submitted_at"],
+                name="app_osa_registry_queue_idx",
+                condition=~models.Q(status="pending"),
+            ),
+            models.Index(
+                fields=["registry", "status", "submitted_at"],
+                name="app_osa_registry_status_idx",
+                condition=~models.Q(status="pending"),
+            ),
+            # registrar worklist
+            models.Index(fields=["assigned_to", "status", "submitted_at"], name="app_osa_assigned_status_idx"),
+            # applicant's own applications
+            models.Index(fields=["applicant", "submitted_at"], name="app_osa_applicant_sub_idx"),
+            # covering indexes for the list ETags' MAX(modified_at)/COUNT (app.conditional)
+            models.Index(
+                fields=["registry", "status", "modified_at"],
+                name="app_osa_registry_modified_idx",
+                condition=~models.Q(status="pending"),
+            ),
+            models.Index(fields=["assigned_to", "modified_at"], name="app_osa_assigned_modified_idx"),
+        ]
 
     def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
         if not self.reference_number:
-            # keep generating until unique
-            ref = generate_reference_number()
-            while OfficialSearchApplication.objects.filter(reference_number=ref).exists():
-                ref = generate_reference_number()
-            self.reference_number = ref
-        super().save(*args, **kwargs)
+            self.reference_number = allocate_reference_numbers(1, using=using)[0]
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        from . import counters
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            counters.record_created(self.registry, self.status)
 
     def __str__(self):
         return f"{self.reference_number} - {self.parcel_number}"
 
 
+class ReferenceSequence(models.Model):
+    # block counter behind app.references; `reserved` holds numbers that
+    # collide with references issued before the allocator existed
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+    reserved = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.next_value}"
+
+
+@receiver(post_delete, sender=OfficialSearchApplication)
+def discount_deleted_application(sender, instance, **kwargs):
+    from . import counters
+    counters.adjust(instance.registry, instance.status, -1)
+
+
+class RegistryStatusCounter(models.Model):
+    # kept in step with every status change by app.counters
+    registry = models.CharField(max_length=100)
+    status = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["registry", "status"], name="app_registry_status_counter_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.registry} {self.status}: {self.count}"
+
+
 class Payment(models.Model):
     application = models.OneToOneField(
         OfficialSearchApplication,
@@ -140,6 +262,35 @@ class Certificate(models.Model):
         return f"Certificate for Application #{self.application.id}"
 
 
+class CertificateUpload(models.Model):
+    # resumable, chunked upload of a signed certificate; see app/uploads.py
+    STATUS_CHOICES = [
+        ("uploading", "Uploading"),
+        ("complete", "Complete"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    application = models.ForeignKey(
+        OfficialSearchApplication,
+        on_delete=models.CASCADE,
+        related_name="certificate_uploads"
+    )
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="certificate_uploads"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="uploading")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Upload {self.id} for Application #{self.application_id}"
+
+
 class Review(models.Model):
     application = models.ForeignKey(
         OfficialSearchApplication,
@@ -155,3 +306,84 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Review by {self.reviewer.username} on App #{self.application.id}"
+
+
+class IdempotencyRecord(models.Model):
+    # durable copy of an Idempotency-Key response (app.idempotency); the cache holds the hot copy
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # null while the first request with the key is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="app_idempotency_user_key_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code or 'in flight'})"
+
+
+class Job(models.Model):
+    # background work queued by app.jobs.enqueue and run by `manage.py run_jobs`
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("failed", "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # workers pick the oldest due job
+            models.Index(fields=["status", "run_at"], name="app_job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class ApplicationEvent(models.Model):
+    # append-only log of status changes, written by app.transitions; read by app.latency
+    application = models.ForeignKey(
+        OfficialSearchApplication,
+        on_delete=models.CASCADE,
+        related_name="events",
+        db_index=False,
+    )
+    registry = models.CharField(max_length=100)
+    from_status = models.CharField(max_length=20)
+    to_status = models.CharField(max_length=20)
+    # registrar holding the application once the change is made
+    registrar = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_index=False,
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["application", "created_at"], name="app_event_app_created_idx"),
+            models.Index(fields=["registry", "created_at"], name="app_event_registry_idx"),
+        ]
+
+    def __str__(self):
+        return f"App #{self.application_id}: {self.from_status} -> {self.to_status}"
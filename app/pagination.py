@@ -0,0 +1,96 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class ApplicationCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (.., submitted_at) application indexes: no COUNT(*), no OFFSET.
+
+    DRF's CursorPagination positions on the first ordering field only and steps over rows
+    sharing it with an offset, which skips or repeats rows when others are inserted or
+    removed meanwhile. Here the position is the (submitted_at, id) pair itself, so it is
+    unique, every page is `(submitted_at, id) > (position)` and the offset is always 0;
+    rows bulk-inserted with one timestamp page like any others.
+    """
+    ordering = ("submitted_at", "id")
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            submitted_at, pk = instance["submitted_at"], instance["id"]
+        else:
+            submitted_at, pk = instance.submitted_at, instance.pk
+        return f"{submitted_at.isoformat()}|{pk}"
+
+    def position_filter(self, position, reverse):
+        submitted_at, _, pk = position.partition("|")
+        try:
+            submitted_at, pk = parse_datetime(submitted_at), int(pk)
+        except ValueError:
+            submitted_at = None
+        if submitted_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        # the redundant bound keeps it a range scan on submitted_at
+        if reverse:
+            return Q(submitted_at__lte=submitted_at) & (Q(submitted_at__lt=submitted_at) | Q(id__lt=pk))
+        return Q(submitted_at__gte=submitted_at) & (Q(submitted_at__gt=submitted_at) | Q(id__gt=pk))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        queryset = queryset.order_by(*(f"-{field}" for field in self.ordering) if reverse else self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, reverse))
+
+        # one extra row tells whether there is a page beyond this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = position is not None, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class ApplicationPaginationMixin:
+    """
+    List views keep page-number pagination by default. `?pagination=cursor`
+    (or following a `next`/`previous` link that carries a cursor) switches to
+    ApplicationCursorPagination.
+    """
+    cursor_pagination_class = ApplicationCursorPagination
+
+    def uses_cursor_pagination(self):
+        params = self.request.query_params
+        return params.get("pagination") == "cursor" or "cursor" in params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.uses_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -0,0 +1,130 @@
+"""
+Reference numbers without uniqueness lookups.
+
+Each application gets a number from a database-backed counter, handed out to each
+process in blocks, and the number is encoded in the usual SRCH format:
+SRCH + 5 base-36 characters + an ISO 7064 MOD 37,36 check character. The encoding
+is a bijection (a multiplicative scramble mod 36**5), so distinct numbers can never
+produce the same reference and consecutive applications don't get guessable ones.
+
+On Postgres the counter is a sequence with INCREMENT BY BLOCK_SIZE; nextval() isn't
+rolled back with the caller's transaction, so a cached block is always safe to use.
+Elsewhere it is a row in ReferenceSequence; a block reserved inside a transaction is
+not kept beyond what was asked for, because a rollback would hand it out again.
+"""
+import string
+import threading
+
+from django.db import connections, transaction
+from django.db.models import F
+
+PREFIX = "SRCH"
+ALPHABET = string.digits + string.ascii_uppercase
+BODY_LENGTH = 5
+CAPACITY = len(ALPHABET) ** BODY_LENGTH
+# any multiplier coprime with 36 makes the scramble a bijection on [0, CAPACITY)
+MULTIPLIER = 7_919_341
+OFFSET = 19_289_447
+BLOCK_SIZE = 100
+
+SEQUENCE_NAME = "application"
+PG_SEQUENCE = "app_reference_number_seq"
+
+
+def check_character(body):
+    # ISO 7064 MOD 37,36: catches every single substitution and all but ~0.15% of adjacent
+    # transpositions (a hybrid system can't catch them all)
+    modulus = len(ALPHABET)
+    product = modulus
+    for char in body:
+        total = (product + ALPHABET.index(char)) % modulus or modulus
+        product = (total * 2) % (modulus + 1)
+    return ALPHABET[(modulus + 1 - product) % modulus]
+
+
+def encode(number):
+    if not 0 <= number < CAPACITY:
+        raise ValueError("Reference number space exhausted.")
+    scrambled = (number * MULTIPLIER + OFFSET) % CAPACITY
+    body = ""
+    for _ in range(BODY_LENGTH):
+        scrambled, rem = divmod(scrambled, len(ALPHABET))
+        body = ALPHABET[rem] + body
+    return PREFIX + body + check_character(body)
+
+
+def decode(reference):
+    """Return the number behind a reference, or None if it isn't one this module could have issued."""
+    reference = (reference or "").upper()
+    body, check = reference[len(PREFIX):-1], reference[-1:]
+    if (
+        not reference.startswith(PREFIX)
+        or len(body) != BODY_LENGTH
+        or any(char not in ALPHABET for char in body + check)
+        or check_character(body) != check
+    ):
+        return None
+    scrambled = 0
+    for char in body:
+        scrambled = scrambled * len(ALPHABET) + ALPHABET.index(char)
+    return ((scrambled - OFFSET) * pow(MULTIPLIER, -1, CAPACITY)) % CAPACITY
+
+
+class ReferenceAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}  # db alias -> list of [next, end) ranges
+        self._reserved = {}  # db alias -> numbers already taken by pre-allocator references
+
+    def allocate(self, count=1, using="default"):
+        connection = connections[using]
+        with self._lock:
+            if using not in self._reserved:
+                self._reserved[using] = self._load_reserved(using)
+            reserved = self._reserved[using]
+            blocks = self._blocks.setdefault(using, [])
+            references = []
+            while len(references) < count:
+                if not blocks:
+                    blocks.extend(self._reserve(connection, count - len(references)))
+                start, end = blocks[0]
+                if start + 1 < end:
+                    blocks[0] = (start + 1, end)
+                else:
+                    blocks.pop(0)
+                if start not in reserved:
+                    references.append(encode(start))
+            if connection.vendor != "postgresql" and connection.in_atomic_block:
+                blocks.clear()
+            return references
+
+    def _load_reserved(self, using):
+        from .models import ReferenceSequence
+        sequence = ReferenceSequence.objects.using(using).filter(name=SEQUENCE_NAME).first()
+        return set(sequence.reserved) if sequence else set()
+
+    def _reserve(self, connection, needed):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(%s) FROM generate_series(1, %s)",
+                    [PG_SEQUENCE, -(-needed // BLOCK_SIZE)],
+                )
+                return [(start, start + BLOCK_SIZE) for (start,) in cursor.fetchall()]
+
+        from .models import ReferenceSequence
+        size = needed if connection.in_atomic_block else max(needed, BLOCK_SIZE)
+        sequences = ReferenceSequence.objects.using(connection.alias).filter(name=SEQUENCE_NAME)
+        with transaction.atomic(using=connection.alias):
+            if not sequences.update(next_value=F("next_value") + size):
+                ReferenceSequence.objects.using(connection.alias).get_or_create(name=SEQUENCE_NAME)
+                sequences.update(next_value=F("next_value") + size)
+            end = sequences.values_list("next_value", flat=True).get()
+        return [(end - size, end)]
+
+
+allocator = ReferenceAllocator()
+
+
+def allocate_reference_numbers(count, using="default"):
+    return allocator.allocate(count, using=using)
@@ -0,0 +1,62 @@
+"""
+JSON rendering and parsing through orjson, when it is installed.
+
+ORJSONRenderer produces the same JSON as DRF's JSONRenderer: datetimes as ISO 8601 with
+"Z" for UTC, and anything orjson doesn't know natively (Decimal, lazy strings, querysets,
+timedelta, ...) converted by DRF's own encoder, so Decimals stay numbers exactly as before
+and DecimalFields keep rendering as strings. Two differences: orjson only handles 64-bit
+integers, so data holding a wider one is rendered by JSONRenderer instead, and NaN or
+Infinity render as null where JSONRenderer raises ValueError. Without orjson both classes
+behave exactly like the DRF ones they extend.
+"""
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        try:
+            content = orjson.dumps(data, default=_encoder.default, option=options)
+        except orjson.JSONEncodeError:
+            # e.g. an integer wider than 64 bits; JSONRenderer renders it or raises the real error
+            return super().render(data, accepted_media_type, renderer_context)
+        # like JSONRenderer, escape the two line terminators JSON allows but JavaScript doesn't
+        if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+            content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return content
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read() if stream is not None else b"")
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+def json_response(data, status=200):
+    """HttpResponse with `data` rendered by ORJSONRenderer, for views outside DRF."""
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type="application/json")
@@ -0,0 +1,89 @@
+"""
+Primary/replica database routing.
+
+Reads go to the "replica" alias when one is configured, writes always go to "default".
+Reads stay on the primary while:
+
+- the request is pinned with use_primary() (ReplicaRoutingMiddleware pins unsafe
+  requests, views with read_from_primary = True, and users who wrote in the last
+  REPLICA_STICKY_SECONDS so they read their own writes), or
+- a transaction is open on the primary, so select_for_update and read-then-write
+  blocks see the rows they are about to change.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+
+_pinned = ContextVar("use_primary", default=False)
+
+
+def sticky_cache_key(user_id):
+    return f"db:primary:{user_id}"
+
+
+def mark_sticky(user_id):
+    """Send `user_id`'s reads to the primary until the replica has caught up with their write."""
+    cache.set(sticky_cache_key(user_id), True, getattr(settings, "REPLICA_STICKY_SECONDS", 10))
+
+
+def is_sticky(user_id):
+    return bool(cache.get(sticky_cache_key(user_id)))
+
+
+async def amark_sticky(user_id):
+    await cache.aset(sticky_cache_key(user_id), True, getattr(settings, "REPLICA_STICKY_SECONDS", 10))
+
+
+async def ais_sticky(user_id):
+    return bool(await cache.aget(sticky_cache_key(user_id)))
+
+
+def pin_to_primary():
+    """Pin the current context to the primary; returns a token for unpin()."""
+    return _pinned.set(True)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+@contextmanager
+def use_primary():
+    token = pin_to_primary()
+    try:
+        yield
+    finally:
+        unpin(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA_DB_ALIAS not in settings.DATABASES or is_pinned():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # follow relations on the database the instance came from
+            return instance._state.db
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema from the primary
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,150 @@
+"""
+Indexed lookups behind ApplicationFilter's parcel_number and reference_number filters.
+
+parcel_number keeps its substring semantics but is answered from a trigram index:
+an FTS5 table with the trigram tokenizer on SQLite (kept in sync by triggers, so
+save(), bulk_create() and update() are all covered) or a pg_trgm GIN index on
+Postgres. Anything else, or a term shorter than a trigram, falls back to icontains.
+
+reference_number is matched as a normalized prefix ("srch-ab" -> SRCHAB..) with a
+range condition, which the unique index on the column answers directly.
+"""
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models.expressions import RawSQL
+
+REFERENCE_PREFIX = "SRCH"
+REFERENCE_LENGTH = 10
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_TABLE = "app_application_search"
+PG_TRIGRAM_INDEX = "app_osa_parcel_trgm_idx"
+SQLITE_TRIGGERS = ("ai", "ad", "au")
+
+_available = {}
+
+
+def _application_table():
+    from .models import OfficialSearchApplication
+    return OfficialSearchApplication._meta.db_table
+
+
+def _sqlite_triggers(table):
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {SEARCH_TABLE}(rowid, parcel_number) VALUES (new.id, new.parcel_number);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, parcel_number)
+            VALUES ('delete', old.id, old.parcel_number);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF parcel_number ON {table} BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, parcel_number)
+            VALUES ('delete', old.id, old.parcel_number);
+            INSERT INTO {SEARCH_TABLE}(rowid, parcel_number) VALUES (new.id, new.parcel_number);
+        END""",
+    ]
+
+
+def install(connection):
+    """Create the parcel number index for this backend. Backends without trigram support are skipped."""
+    table = _application_table()
+    try:
+        # savepoint, so a missing extension/tokenizer doesn't poison the migration's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                    f"parcel_number, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+                for statement in _sqlite_triggers(table):
+                    cursor.execute(statement)
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+            elif connection.vendor == "postgresql":
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {PG_TRIGRAM_INDEX} ON {table} "
+                    f"USING gin (UPPER(parcel_number::text) gin_trgm_ops)"
+                )
+    except DatabaseError:
+        pass
+    _available.pop(connection.alias, None)
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for suffix in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_TRIGRAM_INDEX}")
+    _available.pop(connection.alias, None)
+
+
+def ensure_triggers(connection):
+    """
+    SQLite rebuilds a table (dropping its triggers) whenever a migration alters it,
+    so the sync triggers are restored, and the index rebuilt, after every migrate.
+    """
+    _available.pop(connection.alias, None)
+    if connection.vendor != "sqlite" or not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            [f"{SEARCH_TABLE}_{suffix}" for suffix in SQLITE_TRIGGERS],
+        )
+        if cursor.fetchone()[0] == len(SQLITE_TRIGGERS):
+            return
+        for statement in _sqlite_triggers(_application_table()):
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def is_available(connection):
+    if getattr(settings, "APPLICATION_SEARCH_BACKEND", "auto") == "icontains":
+        return False
+    if connection.alias not in _available:
+        if connection.vendor == "sqlite":
+            found = SEARCH_TABLE in connection.introspection.table_names()
+        elif connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [PG_TRIGRAM_INDEX])
+                found = cursor.fetchone() is not None
+        else:
+            found = False
+        _available[connection.alias] = found
+    return _available[connection.alias]
+
+
+def filter_parcel_number(queryset, value):
+    value = value.strip()
+    if not value:
+        return queryset
+    connection = connections[queryset.db]
+    if len(value) >= MIN_TRIGRAM_LENGTH and is_available(connection) and connection.vendor == "sqlite":
+        phrase = '"' + value.replace('"', '""') + '"'
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [phrase])
+        )
+    # Postgres answers UPPER(parcel_number) LIKE UPPER(%x%) from the trigram index directly
+    return queryset.filter(parcel_number__icontains=value)
+
+
+def normalize_reference_number(value):
+    ref = "".join(ch for ch in value.upper() if ch.isalnum())
+    if ref and not ref.startswith(REFERENCE_PREFIX) and not REFERENCE_PREFIX.startswith(ref):
+        # people usually quote just the code after the prefix
+        ref = REFERENCE_PREFIX + ref
+    return ref
+
+
+def filter_reference_number(queryset, value):
+    ref = normalize_reference_number(value)
+    if not ref:
+        return queryset
+    if not ref.isascii() or len(ref) > REFERENCE_LENGTH:
+        return queryset.filter(reference_number__icontains=value.strip())
+    # references are [0-9A-Z] only, so every match sorts between ref and ref padded with "Z"
+    return queryset.filter(reference_number__range=(ref, ref.ljust(REFERENCE_LENGTH, "Z")))
@@ -1,10 +1,16 @@
 from rest_framework import serializers
+from django.db import transaction
 from .models import (
+    APPLICATION_RELATIONS,
     OfficialSearchApplication,
     Payment,
     Certificate,
+    CertificateUpload,
     Review
 )
+from django.conf import settings
+import os
+from .transitions import TRANSITIONS, transition, transition_many
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -65,11 +71,10 @@ class PaymentSerializer(serializers.ModelSerializer):
         application = self.context["application"]
         validated_data["application"] = application
         validated_data["amount"] = 1050  # hardcode amount for safety
-        payment = super().create(validated_data)
-
-        # Update application status
-        application.status = "submitted"
-        application.save()
+        with transaction.atomic():
+            # claim the application first so a second payment fails before anything is inserted
+            transition(application, "pay")
+            payment = super().create(validated_data)
 
         return payment
 
@@ -80,6 +85,31 @@ class CertificateSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["application", "uploaded_by", "uploaded_at"]
 
+class CertificateUploadSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r"^[0-9a-fA-F]{64}$", required=False, allow_blank=True)
+
+    class Meta:
+        model = CertificateUpload
+        fields = ["id", "application", "filename", "size", "sha256", "received", "status", "created_at"]
+        read_only_fields = ["id", "application", "received", "status", "created_at"]
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+    def validate_filename(self, value):
+        name = os.path.basename(value.replace("\\", "/")).strip()
+        if not name or name in (".", ".."):
+            raise serializers.ValidationError("Invalid file name.")
+        return name
+
+    def validate_sha256(self, value):
+        return value.lower()
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
@@ -87,6 +117,14 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ["application", "reviewer", "created_at"]
 
 
+class ApplicationListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        # one transaction, one INSERT per batch; reference numbers are allocated in bulk by the manager
+        applications = [self.child.Meta.model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            return self.child.Meta.model.objects.bulk_create(applications)
+
+
 class ApplicationSerializer(serializers.ModelSerializer):
     certificate = CertificateSerializer(read_only=True)
     payment = PaymentSerializer(read_only=True) 
@@ -94,8 +132,53 @@ class ApplicationSerializer(serializers.ModelSerializer):
     class Meta:
         model = OfficialSearchApplication
         fields = "__all__"
+        list_serializer_class = ApplicationListSerializer
         read_only_fields = ["applicant", "status", "assigned_to", "submitted_at","reference_number"]        
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(self.context.get("request"))
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request):
+        """
+        The fields a GET asked for, or None for all of them. `?fields=a,b` keeps only those;
+        the nested certificate/payment/reviews are left out unless named there or in
+        `?expand=`. `?expand=` on its own keeps every plain field plus the named relations.
+        """
+        if request is None or request.method not in ("GET", "HEAD"):
+            return None
+        params = getattr(request, "query_params", request.GET)
+        fields, expand = params.get("fields"), params.get("expand")
+        if fields is None and expand is None:
+            return None
+
+        plain = {field.name for field in OfficialSearchApplication._meta.concrete_fields}
+        expand = {name.strip() for name in (expand or "").split(",") if name.strip()}
+        fields = plain if fields is None else {name.strip() for name in fields.split(",") if name.strip()}
+        errors = {}
+        if expand - set(APPLICATION_RELATIONS):
+            errors["expand"] = (
+                f"Unknown relation(s): {', '.join(sorted(expand - set(APPLICATION_RELATIONS)))}. "
+                f"Choose from {', '.join(APPLICATION_RELATIONS)}."
+            )
+        if fields - plain - set(APPLICATION_RELATIONS):
+            errors["fields"] = f"Unknown field(s): {', '.join(sorted(fields - plain - set(APPLICATION_RELATIONS)))}."
+        if errors:
+            raise serializers.ValidationError(errors)
+        return fields | expand
+
+    @classmethod
+    def relations(cls, request):
+        """The nested relations the response will include, for OfficialSearchApplication.with_related()."""
+        selected = cls.selected_fields(request)
+        if selected is None:
+            return APPLICATION_RELATIONS
+        return tuple(name for name in APPLICATION_RELATIONS if name in selected)
+
 
 
 
@@ -117,8 +200,44 @@ class AssignRegistrarSerializer(serializers.Serializer):
         application = self.context["application"]
         registrar = self.validated_data["registrar_id"]
 
-        application.assigned_to = registrar
-        application.status = "assigned"
-        application.save()
-        return application
+        return transition(application, "assign", assigned_to=registrar)
+
 
+
+class BulkAssignRegistrarSerializer(AssignRegistrarSerializer):
+    application_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+
+    def save(self, **kwargs):
+        registry = self.context["registry"]
+        registrar = self.validated_data["registrar_id"]
+        application_ids = list(dict.fromkeys(self.validated_data["application_ids"]))
+        assignable, _ = TRANSITIONS["assign"]
+
+        with transaction.atomic():
+            # one query to check registry ownership and status of every requested application
+            found = {
+                app_id: (app_registry, app_status)
+                for app_id, app_registry, app_status in OfficialSearchApplication.objects.select_for_update()
+                .filter(id__in=application_ids)
+                .values_list("id", "registry", "status")
+            }
+            results = []
+            eligible = []
+            for app_id in application_ids:
+                if app_id not in found:
+                    results.append({"id": app_id, "error": f"Application with ID {app_id} not found."})
+                elif found[app_id][0] != registry:
+                    results.append({"id": app_id, "error": "You can only assign applications from your own registry."})
+                elif found[app_id][1] not in assignable:
+                    results.append({"id": app_id, "error": "Only submitted or already assigned applications can be reassigned."})
+                else:
+                    eligible.append(app_id)
+                    results.append({"id": app_id, "assigned_to": registrar.id})
+
+            transition_many(
+                OfficialSearchApplication.objects.filter(id__in=eligible), "assign", registry,
+                assigned_to=registrar,
+            )
+        return results
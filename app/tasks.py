@@ -0,0 +1,18 @@
+"""Jobs run by `manage.py run_jobs`; see app.jobs."""
+import os
+
+from . import counters
+from .jobs import task
+
+
+@task
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@task(max_attempts=3)
+def rebuild_status_counters():
+    counters.rebuild()
@@ -1,3 +1,1192 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connections, transaction
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import counters, idempotency, jobs, references, routers, uploads
+from .assignment import AutoAssigner
+from .authentication import ClaimsJWTAuthentication, ClaimsUser, tokens_for_user
+from .downloads import sendfile_response
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    ApplicationEvent, Certificate, CertificateUpload, IdempotencyRecord, Job, OfficialSearchApplication, Payment,
+    RegistryStatusCounter, Review,
+)
+from .renderers import ORJSONRenderer
+from .tasks import remove_file
+from .transitions import TransitionNotAllowed, transition
+from .views import ApplicantApplicationListView, CertificateUploadView
+
+User = get_user_model()
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def run_concurrently(count, func):
+    """Call func(i) from `count` threads released together; returns their results in order."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        try:
+            barrier.wait()
+            results[i] = func(i)
+        except Exception as exc:
+            results[i] = exc
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class ConcurrentTransitionTests(TransactionTestCase):
+    """Racing requests on one application: exactly one may win, and the counters stay exact."""
+
+    workers = 8
+
+    def setUp(self):
+        self.applicant = User.objects.create_user(
+            "applicant", "pw", county="Nairobi", registry="Nairobi", role="normal"
+        )
+        self.registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def create_application(self, **fields):
+        return OfficialSearchApplication.objects.create(
+            applicant=self.applicant, parcel_number="NAIROBI/BLOCK1/1", purpose="Official search",
+            county="Nairobi", registry="Nairobi", **fields
+        )
+
+    def assertCountersMatchRebuild(self):
+        def current():
+            return set(RegistryStatusCounter.objects.exclude(count=0).values_list("registry", "status", "count"))
+
+        maintained = current()
+        counters.rebuild()
+        self.assertEqual(maintained, current())
+
+    def assertOneSuccess(self, results, success, failure=400):
+        errors = [result for result in results if isinstance(result, Exception)]
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), [success] + [failure] * (len(results) - 1))
+
+    def test_double_payment(self):
+        application = self.create_application()
+
+        def pay(_):
+            response = client_for(self.applicant).post(
+                f"/api/v1/applications/{application.id}/pay", {"amount": 1050}, format="json"
+            )
+            return response.status_code
+
+        self.assertOneSuccess(run_concurrently(self.workers, pay), 201)
+        self.assertEqual(Payment.objects.filter(application=application).count(), 1)
+        application.refresh_from_db()
+        self.assertEqual(application.status, "submitted")
+        self.assertEqual(ApplicationEvent.objects.filter(application=application).count(), 1)
+        self.assertCountersMatchRebuild()
+
+    def test_double_approval(self):
+        application = self.create_application(status="assigned", assigned_to=self.registrar)
+
+        def approve(i):
+            certificate = SimpleUploadedFile(f"certificate-{i}.pdf", b"%PDF-1.4 signed", "application/pdf")
+            response = client_for(self.registrar).post(
+                f"/api/v1/registrar/approve/{application.id}", {"signed_file": certificate}, format="multipart"
+            )
+            return response.status_code
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            results = run_concurrently(self.workers, approve)
+        self.assertOneSuccess(results, 200)
+        self.assertEqual(Certificate.objects.filter(application=application).count(), 1)
+        application.refresh_from_db()
+        self.assertEqual(application.status, "completed")
+        self.assertCountersMatchRebuild()
+
+    def test_reassigned_application_cannot_be_decided_by_previous_registrar(self):
+        other = User.objects.create_user("other", "pw", county="Nairobi", registry="Nairobi", role="is_registrar")
+        application = self.create_application(status="assigned", assigned_to=self.registrar)
+        stale = OfficialSearchApplication.objects.get(pk=application.pk)
+        transition(OfficialSearchApplication.objects.get(pk=application.pk), "assign", assigned_to=other)
+
+        for action in ("approve", "reject"):
+            with self.assertRaises(TransitionNotAllowed):
+                transition(stale, action)
+            stale.status = "assigned"
+        application.refresh_from_db()
+        self.assertEqual((application.status, application.assigned_to_id), ("assigned", other.id))
+        self.assertCountersMatchRebuild()
+
+
+class ApplicationListQueryBudgetTests(TestCase):
+    """
+    The list views load a page of applications with their certificate, payment and reviews in a
+    fixed number of queries, however many rows and reviews there are: ETag aggregate, COUNT,
+    the page with certificate/payment joined, and one prefetch for all the reviews.
+    """
+
+    QUERY_BUDGET = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user(
+            "applicant", "pw", county="Nairobi", registry="Nairobi", role="normal"
+        )
+        cls.registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        cls.in_charge = User.objects.create_user(
+            "in-charge", "pw", county="Nairobi", registry="Nairobi", role="is_registrar_in_charge"
+        )
+        for i in range(12):
+            application = OfficialSearchApplication.objects.create(
+                applicant=cls.applicant, parcel_number=f"NAIROBI/BLOCK1/{i}", purpose="Official search",
+                county="Nairobi", registry="Nairobi", status="completed", assigned_to=cls.registrar,
+            )
+            Payment.objects.create(application=application, amount=1050)
+            Certificate.objects.create(
+                application=application, uploaded_by=cls.registrar, signed_file=f"certificates/{i}.pdf"
+            )
+            Review.objects.bulk_create(
+                Review(application=application, reviewer=cls.registrar, comment=f"Review {n}") for n in range(3)
+            )
+
+    def assertListWithinBudget(self, user, url):
+        client = client_for(user)
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 5)
+        for row in results:
+            self.assertIsNotNone(row["certificate"])
+            self.assertIsNotNone(row["payment"])
+            self.assertEqual(len(row["reviews"]), 3)
+
+    def test_applicant_list(self):
+        self.assertListWithinBudget(self.applicant, "/api/v1/applications")
+
+    def test_registrar_in_charge_list(self):
+        self.assertListWithinBudget(self.in_charge, "/api/v1/registrar-in-charge/submitted")
+
+    def test_registrar_list(self):
+        self.assertListWithinBudget(self.registrar, "/api/v1/registrar/assigned")
+
+    def test_fields_without_relations_skip_their_queries(self):
+        client = client_for(self.applicant)
+        with self.assertNumQueries(self.QUERY_BUDGET - 1):  # no reviews prefetch, nothing joined
+            response = client.get("/api/v1/applications?fields=id,status")
+        self.assertEqual(response.status_code, 200)
+        for row in response.json()["results"]:
+            self.assertEqual(set(row), {"id", "status"})
+
+        with self.assertNumQueries(self.QUERY_BUDGET - 1):  # certificate joined, no reviews prefetch
+            response = client.get("/api/v1/applications?fields=id&expand=certificate")
+        for row in response.json()["results"]:
+            self.assertEqual(set(row), {"id", "certificate"})
+            self.assertIsNotNone(row["certificate"])
+
+    def test_expand_alone_keeps_plain_fields(self):
+        response = client_for(self.applicant).get("/api/v1/applications?expand=reviews")
+        row = response.json()["results"][0]
+        self.assertIn("parcel_number", row)
+        self.assertEqual(len(row["reviews"]), 3)
+        self.assertNotIn("certificate", row)
+        self.assertNotIn("payment", row)
+
+    def test_unknown_fields_and_relations_are_rejected(self):
+        client = client_for(self.applicant)
+        response = client.get("/api/v1/applications?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("fields", response.json())
+        response = client.get("/api/v1/applications?expand=applicant")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("expand", response.json())
+
+
+class MetricsAccessTests(TestCase):
+    """/metrics is 404 unless the scraper sends the bearer token or comes from a listed address."""
+
+    def test_loopback_is_not_trusted_by_default(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="127.0.0.1").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 404)
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"])
+    def test_allowed_address(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 200)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="127.0.0.1").status_code, 404)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0)
+class CompressionTests(TestCase):
+    """Only JSON API responses are compressed; HTML pages with a CSRF token never are."""
+
+    def test_json_is_compressed(self):
+        applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        for i in range(5):
+            OfficialSearchApplication.objects.create(
+                applicant=applicant, parcel_number=f"NAIROBI/BLOCK1/{i}", purpose="Official search",
+                county="Nairobi", registry="Nairobi",
+            )
+        response = client_for(applicant).get("/api/v1/applications", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_admin_login_is_not_compressed(self):
+        response = self.client.get("/admin/login/?next=/admin/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("csrfmiddlewaretoken", response.content.decode())
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """ORJSONRenderer against DRF's JSONRenderer on the same data."""
+
+    def assertSameAsDRF(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_matches_json_renderer(self):
+        self.assertSameAsDRF({
+            "when": timezone.now(),
+            "amount": Decimal("1050.00"),
+            "text": "line\u2028separator",
+            "nested": [1, None, True, 1.5],
+        })
+
+    def test_integers_wider_than_64_bits_fall_back(self):
+        self.assertSameAsDRF({"big": 2 ** 70, "negative": -(2 ** 64)})
+
+    def test_nan_renders_as_null(self):
+        self.assertEqual(ORJSONRenderer().render({"value": float("nan")}), b'{"value":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({"value": float("nan")})
+
+
+class SendfileTests(TestCase):
+
+    @override_settings(SENDFILE_BACKEND="x-accel-redirect", SENDFILE_URL_PREFIX="/protected/")
+    def test_accel_redirect_path_is_quoted(self):
+        response = sendfile_response(None, "certificates/deed #4 100%?.pdf")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected/certificates/deed%20%234%20100%25%3F.pdf")
+
+
+class ApplicationAdminTests(TestCase):
+    """Status, registry and assignee can be set on a new application but not edited afterwards."""
+
+    def test_transition_fields_are_read_only_on_change(self):
+        superuser = User.objects.create_superuser("admin", "pw", county="Nairobi", registry="Nairobi")
+        applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        application = OfficialSearchApplication.objects.create(
+            applicant=applicant, parcel_number="NAIROBI/BLOCK1/1", purpose="Official search",
+            county="Nairobi", registry="Nairobi",
+        )
+        request = RequestFactory().get("/admin/")
+        request.user = superuser
+        model_admin = admin.site._registry[OfficialSearchApplication]
+
+        added = model_admin.get_form(request).base_fields
+        changed = model_admin.get_form(request, application).base_fields
+        for name in ("status", "registry", "assigned_to"):
+            self.assertIn(name, added)
+            self.assertNotIn(name, changed)
+
+
+class ReplicaRoutingTests(TestCase):
+    """Which requests ReplicaRoutingMiddleware keeps on the primary, in both handler modes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user(
+            "applicant", "pw", county="Nairobi", registry="Nairobi", role="normal"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.authorization = f"Bearer {tokens_for_user(self.applicant).access_token}"
+
+    def request(self, method="GET"):
+        return RequestFactory().generic(method, "/api/v1/applications", HTTP_AUTHORIZATION=self.authorization)
+
+    def pinned_during(self, view, method="GET"):
+        """Run `view` through the middleware as Django's sync handler would; was it pinned?"""
+        seen = []
+
+        def handler(request):
+            middleware.process_view(request, view, (), {})
+            seen.append(routers.is_pinned())
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(handler)
+        middleware(self.request(method))
+        self.assertFalse(routers.is_pinned())
+        return seen[0]
+
+    async def apinned_during(self, view, method="GET"):
+        seen = []
+
+        async def handler(request):
+            await middleware.process_view(request, view, (), {})
+            seen.append(routers.is_pinned())
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(handler)
+        await middleware(self.request(method))
+        self.assertFalse(routers.is_pinned())
+        return seen[0]
+
+    def test_successful_write_makes_the_writer_sticky(self):
+        client = APIClient(HTTP_AUTHORIZATION=self.authorization)
+        response = client.post("/api/v1/applications/create", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(routers.is_sticky(self.applicant.id))
+
+        response = client.post("/api/v1/applications/create", {
+            "parcel_number": "NAIROBI/BLOCK1/1", "purpose": "Official search",
+            "county": "Nairobi", "registry": "Nairobi",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(routers.is_sticky(self.applicant.id))
+
+    def test_reads_follow_view_method_and_stickiness(self):
+        list_view = ApplicantApplicationListView.as_view()
+        self.assertFalse(self.pinned_during(list_view))
+        self.assertTrue(self.pinned_during(list_view, "POST"))
+        self.assertTrue(self.pinned_during(CertificateUploadView.as_view()))
+        routers.mark_sticky(self.applicant.id)
+        self.assertTrue(self.pinned_during(list_view))
+
+    async def test_async_reads_follow_view_method_and_stickiness(self):
+        list_view = ApplicantApplicationListView.as_view()
+        self.assertFalse(await self.apinned_during(list_view))
+        self.assertTrue(await self.apinned_during(list_view, "POST"))
+        self.assertTrue(await self.apinned_during(CertificateUploadView.as_view()))
+        await routers.amark_sticky(self.applicant.id)
+        self.assertTrue(await self.apinned_during(list_view))
+
+    def test_token_is_decoded_once(self):
+        request = self.request()
+        middleware = ReplicaRoutingMiddleware(
+            lambda request: middleware.process_view(request, ApplicantApplicationListView.as_view(), (), {})
+            or HttpResponse()
+        )
+        middleware(request)
+        decoded = request._validated_token
+        self.assertEqual(str(decoded["user_id"]), str(self.applicant.id))
+        user, validated_token = ClaimsJWTAuthentication().authenticate(request)
+        self.assertIs(validated_token, decoded)
+        self.assertEqual(str(user.id), str(self.applicant.id))
+
+
+class ChunkedUploadTests(TestCase):
+    """Resumable certificate uploads: chunks go to the upload, completion only takes a POST."""
+
+    body = b"hello world"
+
+    @classmethod
+    def setUpTestData(cls):
+        applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        cls.registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        cls.application = OfficialSearchApplication.objects.create(
+            applicant=applicant, parcel_number="NAIROBI/BLOCK1/1", purpose="Official search",
+            county="Nairobi", registry="Nairobi", status="assigned", assigned_to=cls.registrar,
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = client_for(self.registrar)
+
+    def start_upload(self):
+        response = self.client.post(
+            f"/api/v1/registrar/approve/{self.application.id}/uploads",
+            {"filename": "certificate.pdf", "size": len(self.body)}, format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def put_chunk(self, url):
+        return self.client.generic(
+            "PUT", url, self.body, content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes 0-{len(self.body) - 1}/{len(self.body)}",
+            HTTP_X_CHUNK_SHA256=hashlib.sha256(self.body).hexdigest(),
+        )
+
+    def test_complete_only_accepts_post(self):
+        upload_id = self.start_upload()
+        complete = f"/api/v1/registrar/uploads/{upload_id}/complete"
+        self.assertEqual(self.put_chunk(complete).status_code, 405)
+        self.assertEqual(self.client.get(complete).status_code, 405)
+
+        self.assertEqual(self.put_chunk(f"/api/v1/registrar/uploads/{upload_id}").json(), {"received": len(self.body)})
+        response = self.client.post(complete)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "complete")
+
+    def test_abandoned_uploads_are_purged(self):
+        stale_id, fresh_id = self.start_upload(), self.start_upload()
+        for upload_id in (stale_id, fresh_id):
+            self.put_chunk(f"/api/v1/registrar/uploads/{upload_id}")
+        CertificateUpload.objects.filter(pk=stale_id).update(created_at=timezone.now() - timedelta(days=2))
+        stale_part = uploads.part_path(CertificateUpload(pk=stale_id))
+        self.assertTrue(os.path.exists(stale_part))
+
+        self.assertEqual(self.client.get(f"/api/v1/registrar/uploads/{stale_id}").status_code, 404)
+        call_command("purge_stale_uploads", stdout=io.StringIO())
+        self.assertFalse(CertificateUpload.objects.filter(pk=stale_id).exists())
+        self.assertFalse(os.path.exists(stale_part))
+        self.assertTrue(os.path.exists(uploads.part_path(CertificateUpload(pk=fresh_id))))
+        self.assertEqual(self.client.get(f"/api/v1/registrar/uploads/{fresh_id}").status_code, 200)
+
+
+@jobs.task(name="tests.always_fails", max_attempts=3)
+def always_fails():
+    raise RuntimeError("boom")
+
+
+@override_settings(JOB_RETRY_DELAY=5, JOB_RETRY_MAX_DELAY=60)
+class JobQueueTests(TestCase):
+    """Jobs appear only after commit, back off between attempts and end up `failed`."""
+
+    def test_rolled_back_transaction_enqueues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    jobs.enqueue(remove_file, path="/nonexistent")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(Job.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                jobs.enqueue(remove_file, path="/nonexistent")
+        self.assertEqual(Job.objects.get().payload, {"path": "/nonexistent"})
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        for attempt, (low, high) in {1: (2.5, 5), 2: (5, 10), 3: (10, 20), 10: (30, 60)}.items():
+            for _ in range(20):
+                self.assertTrue(low <= jobs.backoff(attempt) <= high)
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue(always_fails)
+        worker = jobs.Worker("test")
+
+        for attempt in (1, 2):
+            before = timezone.now()
+            self.assertTrue(worker.run_one())
+            job = Job.objects.get()
+            self.assertEqual((job.status, job.attempts), ("queued", attempt))
+            self.assertIn("RuntimeError: boom", job.last_error)
+            self.assertGreaterEqual(job.run_at, before + timedelta(seconds=2.5 * 2 ** (attempt - 1)))
+            self.assertFalse(worker.run_one())
+            Job.objects.update(run_at=timezone.now())
+
+        self.assertTrue(worker.run_one())
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ("failed", 3))
+        self.assertFalse(worker.run_one())
+
+    def test_part_file_removed_on_commit_with_a_job_only_on_failure(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            upload = CertificateUpload(pk="6f1c2b4e-1111-4c3b-9a55-000000000001")
+            path = uploads.part_path(upload)
+            os.makedirs(os.path.dirname(path))
+            open(path, "wb").close()
+            with self.captureOnCommitCallbacks(execute=True):
+                uploads.discard_on_commit(upload)
+            self.assertFalse(os.path.exists(path))
+            self.assertFalse(Job.objects.exists())
+
+            os.makedirs(path)  # os.remove() fails on a directory
+            with self.captureOnCommitCallbacks(execute=True):
+                uploads.discard_on_commit(upload)
+            self.assertEqual(Job.objects.get().payload, {"path": path})
+
+
+class RegistryLatencyTests(TestCase):
+    """Nearest-rank p50/p95 per status and per registrar, from events with known spacings."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.in_charge = User.objects.create_user(
+            "in-charge", "pw", county="Nairobi", registry="Nairobi", role="is_registrar_in_charge"
+        )
+        cls.registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        start = timezone.now() - timedelta(days=20)
+        # application k waits k hours to be paid, 10 minutes to be assigned and k days to be approved;
+        # one more in another registry and one decided long ago must not count
+        for k, registry, submitted_at in [
+            (1, "Nairobi", start), (2, "Nairobi", start), (3, "Nairobi", start), (4, "Nairobi", start),
+            (9, "Mombasa", start), (9, "Nairobi", start - timedelta(days=90)),
+        ]:
+            application = OfficialSearchApplication.objects.create(
+                applicant=applicant, parcel_number=f"NAIROBI/BLOCK1/{k}", purpose="Official search",
+                county=registry, registry=registry, status="completed", assigned_to=cls.registrar,
+            )
+            OfficialSearchApplication.objects.filter(pk=application.pk).update(submitted_at=submitted_at)
+            paid = submitted_at + timedelta(hours=k)
+            assigned = paid + timedelta(minutes=10)
+            for from_status, to_status, registrar, created_at in [
+                ("pending", "submitted", None, paid),
+                ("submitted", "assigned", cls.registrar, assigned),
+                ("assigned", "completed", cls.registrar, assigned + timedelta(days=k)),
+            ]:
+                ApplicationEvent.objects.create(
+                    application=application, registry=registry, from_status=from_status, to_status=to_status,
+                    registrar=registrar, created_at=created_at,
+                )
+
+    def test_percentiles(self):
+        response = client_for(self.in_charge).get("/api/v1/registrar-in-charge/latency")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        hour, day = 3600, 24 * 3600
+        by_status = {row["status"]: row for row in data["by_status"]}
+        self.assertEqual(set(by_status), {"pending", "submitted", "assigned"})
+        self.assertEqual(
+            [by_status["pending"][key] for key in ("count", "p50_seconds", "p95_seconds")], [4, 2 * hour, 4 * hour]
+        )
+        self.assertEqual(
+            [by_status["submitted"][key] for key in ("count", "p50_seconds", "p95_seconds")], [4, 600, 600]
+        )
+        self.assertEqual(
+            [by_status["assigned"][key] for key in ("count", "p50_seconds", "p95_seconds")], [4, 2 * day, 4 * day]
+        )
+        [by_registrar] = data["by_registrar"]
+        self.assertEqual(
+            (by_registrar["registrar"], by_registrar["status"], by_registrar["count"], by_registrar["p95_seconds"]),
+            ("registrar", "assigned", 4, 4 * day),
+        )
+
+    def test_days_must_be_in_range(self):
+        client = client_for(self.in_charge)
+        for days in ("0", "-1", "3651", "99999999999", "x"):
+            self.assertEqual(client.get("/api/v1/registrar-in-charge/latency", {"days": days}).status_code, 400)
+        self.assertEqual(client.get("/api/v1/registrar-in-charge/latency", {"days": "3650"}).status_code, 200)
+
+
+class CursorPaginationTests(TestCase):
+    """?pagination=cursor pages on (submitted_at, id): ties are neither skipped nor repeated."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user(
+            "applicant", "pw", county="Nairobi", registry="Nairobi", role="normal"
+        )
+
+    def create_applications(self, count, submitted_at):
+        OfficialSearchApplication.objects.bulk_create([
+            OfficialSearchApplication(
+                applicant=self.applicant, parcel_number=f"NAIROBI/BLOCK1/{i}", purpose="Official search",
+                county="Nairobi", registry="Nairobi",
+            )
+            for i in range(count)
+        ])
+        # submitted_at is auto_now_add: date the new rows afterwards
+        OfficialSearchApplication.objects.exclude(pk__in=self.dated).update(submitted_at=submitted_at)
+        self.dated = set(OfficialSearchApplication.objects.values_list("pk", flat=True))
+
+    def setUp(self):
+        self.dated = set()
+        self.client = client_for(self.applicant)
+        moment = timezone.now().replace(microsecond=0)
+        self.create_applications(3, moment - timedelta(hours=1))
+        self.create_applications(12, moment)  # one bulk insert, one timestamp
+        self.create_applications(3, moment + timedelta(hours=1))
+        self.ordered = list(OfficialSearchApplication.objects.order_by("submitted_at", "id").values_list("pk", flat=True))
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertNotIn("count", data)
+        return [row["id"] for row in data["results"]], data["next"], data["previous"]
+
+    def test_pages_through_ties_while_rows_disappear(self):
+        ids, next_url, previous_url = self.page("/api/v1/applications", {"pagination": "cursor", "page_size": 5})
+        self.assertEqual(ids, self.ordered[:5])
+        self.assertIsNone(previous_url)
+
+        # removing a row already seen must not shift the next page
+        OfficialSearchApplication.objects.filter(pk=ids[-1]).delete()
+        seen = list(ids)
+        while next_url:
+            ids, next_url, previous_url = self.page(next_url)
+            seen += ids
+        self.assertEqual(seen, self.ordered)
+
+        ids, next_url, previous_url = self.page(previous_url)
+        self.assertEqual(ids, self.ordered[10:15])
+        self.assertIsNotNone(next_url)
+        self.assertEqual(self.page(next_url)[0], self.ordered[15:])
+
+    def test_page_size_is_capped(self):
+        self.create_applications(490, timezone.now())
+        ids, next_url, _ = self.page("/api/v1/applications", {"pagination": "cursor", "page_size": 1000})
+        self.assertEqual(len(ids), 500)
+        self.assertEqual(len(self.page(next_url)[0]), len(self.ordered) + 490 - 500)
+
+    def test_malformed_cursor_is_404(self):
+        response = self.client.get("/api/v1/applications", {"cursor": "cD1nYXJiYWdl"})  # p=garbage
+        self.assertEqual(response.status_code, 404)
+
+
+class CertificateFileRangeTests(TestCase):
+    """Byte ranges on certificate downloads: 206, 416, ignored invalid ranges and If-Range."""
+
+    body = b"0123456789abcdefghij"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user(
+            "applicant", "pw", county="Nairobi", registry="Nairobi", role="normal"
+        )
+        registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        application = OfficialSearchApplication.objects.create(
+            applicant=cls.applicant, parcel_number="NAIROBI/BLOCK1/1", purpose="Official search",
+            county="Nairobi", registry="Nairobi", status="completed", assigned_to=registrar,
+        )
+        cls.certificate = Certificate.objects.create(
+            application=application, uploaded_by=registrar, signed_file="certificates/signed.pdf"
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(media_root, "certificates"))
+        with open(os.path.join(media_root, "certificates", "signed.pdf"), "wb") as file:
+            file.write(self.body)
+        self.client = client_for(self.applicant)
+        self.url = f"/api/v1/certificates/{self.certificate.pk}/file"
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_ranges(self):
+        response, body = self.get(HTTP_RANGE="bytes=2-5")
+        self.assertEqual((response.status_code, body, response["Content-Range"]), (206, b"2345", "bytes 2-5/20"))
+        response, body = self.get(HTTP_RANGE="bytes=-3")
+        self.assertEqual((response.status_code, body), (206, b"hij"))
+        response, body = self.get(HTTP_RANGE="bytes=15-")
+        self.assertEqual((response.status_code, body), (206, b"fghij"))
+
+    def test_unsatisfiable_range_is_416(self):
+        response, _ = self.get(HTTP_RANGE="bytes=20-")
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, "bytes */20"))
+
+    def test_invalid_range_is_ignored(self):
+        for header in ("bytes=5-3", "bytes=abc", "bytes=0-1,4-5"):
+            response, body = self.get(HTTP_RANGE=header)
+            self.assertEqual((response.status_code, body), (200, self.body))
+
+    def test_if_range(self):
+        etag = self.get()[0]["ETag"]
+        response, body = self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, body), (206, b"01"))
+        for if_range in (f"W/{etag}", '"stale"'):
+            response, body = self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE=if_range)
+            self.assertEqual((response.status_code, body), (200, self.body))
+        # a failed If-Range serves the file even when the range could not be satisfied
+        response, body = self.get(HTTP_RANGE="bytes=50-", HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.body))
+
+
+class ReferenceEncodingTests(SimpleTestCase):
+    """SRCH references: a bijective scramble of the counter plus a MOD 37,36 check character."""
+
+    numbers = [0, 1, 2, 99, 100, 12345, references.CAPACITY - 1] + list(range(1000, 3000, 7))
+
+    def test_roundtrip(self):
+        encoded = [references.encode(number) for number in self.numbers]
+        self.assertEqual(len(set(encoded)), len(encoded))
+        for number, reference in zip(self.numbers, encoded):
+            self.assertRegex(reference, r"^SRCH[0-9A-Z]{6}$")
+            self.assertEqual(references.decode(reference), number)
+            self.assertEqual(references.decode(reference.lower()), number)
+        with self.assertRaises(ValueError):
+            references.encode(references.CAPACITY)
+        for junk in ("", None, "SRCH", "XXXX123456", "SRCH12345", "SRCH1234567"):
+            self.assertIsNone(references.decode(junk))
+
+    def test_every_single_substitution_is_rejected(self):
+        for number in self.numbers:
+            reference = references.encode(number)
+            for i in range(len(references.PREFIX), len(reference)):
+                for char in references.ALPHABET.replace(reference[i], ""):
+                    self.assertIsNone(references.decode(reference[:i] + char + reference[i + 1:]))
+
+    def test_adjacent_transpositions_are_almost_all_rejected(self):
+        caught = missed = 0
+        for number in range(20000):
+            reference = references.encode(number)
+            for i in range(len(references.PREFIX), len(reference) - 1):
+                if reference[i] == reference[i + 1]:
+                    continue
+                swapped = reference[:i] + reference[i + 1] + reference[i] + reference[i + 2:]
+                if references.decode(swapped) is None:
+                    caught += 1
+                else:
+                    missed += 1
+        self.assertLess(missed / (caught + missed), 0.002)
+
+
+class ReferenceAllocatorTests(TransactionTestCase):
+    """Blocks from the shared counter never overlap, across processes and rolled-back transactions."""
+
+    def test_unique_across_blocks_and_allocators(self):
+        # two allocators stand in for two processes, each caching its own blocks
+        first, second = references.ReferenceAllocator(), references.ReferenceAllocator()
+        issued = []
+        for count in (60, 60, 1, 150, 39, 100):
+            issued += first.allocate(count)
+            issued += second.allocate(count)
+        self.assertEqual(len(issued), 2 * 410)
+        self.assertEqual(len(set(issued)), len(issued))
+
+    def test_block_reserved_in_a_rolled_back_transaction_is_not_reused(self):
+        first, second = references.ReferenceAllocator(), references.ReferenceAllocator()
+        try:
+            with transaction.atomic():
+                abandoned = first.allocate(3)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # on SQLite the counter rolled back: had `first` cached the rest of its block, it would
+        # now hand out numbers `second` also gets
+        issued = second.allocate(100) + first.allocate(100)
+        self.assertEqual(len(set(issued)), len(issued))
+        self.assertEqual(len(abandoned), 3)
+
+    def test_block_reserved_inside_a_committed_transaction(self):
+        allocator = references.ReferenceAllocator()
+        with transaction.atomic():
+            inside = allocator.allocate(2)
+        after = allocator.allocate(2)
+        self.assertEqual(len(set(inside + after)), 4)
+        numbers = [references.decode(reference) for reference in inside + after]
+        self.assertEqual(numbers, list(range(numbers[0], numbers[0] + 4)))
+
+
+def application_data(i, **fields):
+    return {
+        "parcel_number": f"NAIROBI/BLOCK1/{i}", "purpose": "Official search",
+        "county": "Nairobi", "registry": "Nairobi", **fields,
+    }
+
+
+class BulkApplicationCreateTests(TestCase):
+    """applications/bulk-create inserts the whole list or nothing, with errors per item."""
+
+    url = "/api/v1/applications/bulk-create"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user(
+            "applicant", "pw", county="Nairobi", registry="Nairobi", role="normal"
+        )
+
+    def setUp(self):
+        self.client = client_for(self.applicant)
+
+    def test_creates_every_item(self):
+        response = self.client.post(self.url, [application_data(i) for i in range(3)], format="json")
+        self.assertEqual(response.status_code, 201)
+        rows = response.json()
+        self.assertEqual([row["parcel_number"] for row in rows], [f"NAIROBI/BLOCK1/{i}" for i in range(3)])
+        self.assertEqual(len({row["reference_number"] for row in rows}), 3)
+        self.assertEqual(OfficialSearchApplication.objects.filter(applicant=self.applicant).count(), 3)
+        self.assertEqual(counters.snapshot("Nairobi")["pending"], 3)
+
+    def test_errors_line_up_with_items_and_nothing_is_inserted(self):
+        batch = [application_data(0), application_data(1, parcel_number=""), application_data(2, county=None)]
+        response = self.client.post(self.url, batch, format="json")
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ["parcel_number"])
+        self.assertEqual(list(errors[2]), ["county"])
+        self.assertFalse(OfficialSearchApplication.objects.exists())
+
+    def test_batch_limits(self):
+        self.assertEqual(self.client.post(self.url, [], format="json").status_code, 400)
+        batch = [application_data(i) for i in range(101)]
+        self.assertEqual(self.client.post(self.url, batch, format="json").status_code, 400)
+        self.assertFalse(OfficialSearchApplication.objects.exists())
+
+    def test_insert_failure_rolls_back_the_whole_batch(self):
+        # drain any block cached by earlier tests, then plant a row on the batch's second reference
+        references.allocate_reference_numbers(1)
+        next_number = references.decode(references.allocate_reference_numbers(1)[0]) + 1
+        existing = OfficialSearchApplication.objects.create(
+            applicant=self.applicant, reference_number=references.encode(next_number + 1), **application_data(9)
+        )
+        before = counters.snapshot("Nairobi")
+
+        with self.assertRaises(IntegrityError):
+            self.client.post(self.url, [application_data(i) for i in range(3)], format="json")
+        self.assertEqual(list(OfficialSearchApplication.objects.values_list("pk", flat=True)), [existing.pk])
+        self.assertEqual(counters.snapshot("Nairobi"), before)
+
+
+class BulkAssignTests(TestCase):
+    """registrar-in-charge/assign-bulk: a result per id, counters moved only for the assigned ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.in_charge = User.objects.create_user(
+            "in-charge", "pw", county="Nairobi", registry="Nairobi", role="is_registrar_in_charge"
+        )
+        cls.registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+
+        def create(registry, status):
+            return OfficialSearchApplication.objects.create(
+                applicant=applicant, status=status, **application_data(0, county=registry, registry=registry)
+            )
+
+        cls.submitted = [create("Nairobi", "submitted") for _ in range(3)]
+        cls.pending = create("Nairobi", "pending")
+        cls.elsewhere = create("Mombasa", "submitted")
+
+    def test_results_per_id_and_counter_deltas(self):
+        before = counters.snapshot("Nairobi")
+        ids = [app.id for app in self.submitted] + [self.pending.id, self.elsewhere.id, 999999, self.submitted[0].id]
+        response = client_for(self.in_charge).post(
+            "/api/v1/registrar-in-charge/assign-bulk",
+            {"registrar_id": self.registrar.id, "application_ids": ids}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["assigned"], 3)
+        results = {result["id"]: result for result in data["results"]}
+        self.assertEqual(len(data["results"]), 6)  # the repeated id is reported once
+        for app in self.submitted:
+            self.assertEqual(results[app.id], {"id": app.id, "assigned_to": self.registrar.id})
+        for app_id in (self.pending.id, self.elsewhere.id, 999999):
+            self.assertIn("error", results[app_id])
+
+        after = counters.snapshot("Nairobi")
+        self.assertEqual(after["submitted"] - before["submitted"], -3)
+        self.assertEqual(after["assigned"] - before["assigned"], 3)
+        self.assertEqual(after["pending"], before["pending"])
+        self.assertEqual(
+            ApplicationEvent.objects.filter(to_status="assigned", registrar=self.registrar).count(), 3
+        )
+        self.assertEqual(OfficialSearchApplication.objects.get(pk=self.elsewhere.pk).status, "submitted")
+
+    def test_registrar_from_another_registry_is_refused(self):
+        outsider = User.objects.create_user("outsider", "pw", county="Mombasa", registry="Mombasa", role="is_registrar")
+        response = client_for(self.in_charge).post(
+            "/api/v1/registrar-in-charge/assign-bulk",
+            {"registrar_id": outsider.id, "application_ids": [self.submitted[0].id]}, format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(OfficialSearchApplication.objects.get(pk=self.submitted[0].pk).status, "submitted")
+
+
+class AutoAssignerTests(TestCase):
+    """least-loaded fills the emptiest registrar first; round-robin keeps its turn across batches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.busy = User.objects.create_user("busy", "pw", county="Nairobi", registry="Nairobi", role="is_registrar")
+        cls.idle = User.objects.create_user("idle", "pw", county="Nairobi", registry="Nairobi", role="is_registrar")
+        User.objects.create_user("elsewhere", "pw", county="Mombasa", registry="Mombasa", role="is_registrar")
+        cls.applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        for i in range(2):
+            OfficialSearchApplication.objects.create(
+                applicant=cls.applicant, status="assigned", assigned_to=cls.busy, **application_data(i)
+            )
+
+    def submit(self, count):
+        return [
+            OfficialSearchApplication.objects.create(
+                applicant=self.applicant, status="submitted", **application_data(i)
+            ).pk
+            for i in range(count)
+        ]
+
+    def assignees(self, ids):
+        assigned_to = dict(OfficialSearchApplication.objects.filter(pk__in=ids).values_list("pk", "assigned_to"))
+        return [assigned_to[pk] for pk in ids]
+
+    def test_least_loaded_goes_to_the_registrar_with_fewest_open(self):
+        ids = self.submit(3)
+        self.assertEqual(AutoAssigner("Nairobi").run(), 3)
+        # idle catches up with busy's two open applications, then the tie goes to the lower id
+        self.assertEqual(self.assignees(ids), [self.idle.pk, self.idle.pk, self.busy.pk])
+
+    def test_round_robin_continues_across_batches(self):
+        ids = self.submit(5)
+        assigner = AutoAssigner("Nairobi", strategy="round-robin")
+        self.assertEqual(assigner.run_batch(batch_size=2), 2)
+        self.assertEqual(assigner.run(batch_size=2), 3)
+        self.assertEqual(
+            self.assignees(ids), [self.busy.pk, self.idle.pk, self.busy.pk, self.idle.pk, self.busy.pk]
+        )
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            AutoAssigner("Nairobi", strategy="random")
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """ClaimsJWTAuthentication trusts token claims until the user's token_version moves on."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.token = tokens_for_user(self.user).access_token
+
+    def authenticate(self):
+        request = RequestFactory().get("/api/v1/applications", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        user, _ = ClaimsJWTAuthentication().authenticate(request)
+        return user
+
+    def test_user_comes_from_claims(self):
+        with self.assertNumQueries(1):  # the token_version lookup, then cached
+            user = self.authenticate()
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.role, user.registry, user.county), ("is_registrar", "Nairobi", "Nairobi"))
+        with self.assertNumQueries(0):
+            self.assertEqual(str(self.authenticate().id), str(self.user.id))
+
+    def test_role_change_revokes_tokens(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = "is_registrar_in_charge"
+            self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, "revoked"):
+            self.authenticate()
+        self.token = tokens_for_user(self.user).access_token
+        self.assertEqual(self.authenticate().role, "is_registrar_in_charge")
+
+    def test_password_change_revokes_tokens(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("new-pw")
+            self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, "revoked"):
+            self.authenticate()
+
+    def test_unrelated_save_keeps_tokens(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_login = timezone.now()
+            self.user.save()
+        self.assertEqual(self.authenticate().role, "is_registrar")
+
+
+class IdempotencyKeyTests(TestCase):
+    """Idempotency-Key on applications/create: replay, in-flight 409, different-body 422, release on error."""
+
+    url = "/api/v1/applications/create"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = client_for(self.applicant)
+
+    def post(self, body, key="key-1"):
+        return self.client.post(self.url, json.dumps(body), content_type="application/json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post(application_data(1))
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", first)
+
+        replayed = self.post(application_data(1))
+        self.assertEqual(replayed.status_code, 201)
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+        self.assertEqual(replayed.json(), first.json())
+
+        cache.clear()  # the IdempotencyRecord row answers once the cached copy is gone
+        self.assertEqual(self.post(application_data(1)).json(), first.json())
+        self.assertEqual(OfficialSearchApplication.objects.count(), 1)
+
+    def test_key_in_flight_is_refused(self):
+        body = json.dumps(application_data(1))
+        request = RequestFactory().post(self.url, body, content_type="application/json")
+        self.assertIsNone(idempotency.claim(self.applicant.id, "key-1", idempotency.fingerprint(request)))
+
+        response = self.post(application_data(1))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(OfficialSearchApplication.objects.exists())
+
+    def test_key_reused_with_a_different_body_is_refused(self):
+        self.assertEqual(self.post(application_data(1)).status_code, 201)
+        response = self.post(application_data(2))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(OfficialSearchApplication.objects.count(), 1)
+
+    def test_error_releases_the_key(self):
+        response = self.post(application_data(1, purpose=""))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        # the client fixes the request and retries with the same key
+        response = self.post(application_data(1))
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    def test_keys_are_scoped_per_user(self):
+        other = User.objects.create_user("other", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        self.assertEqual(self.post(application_data(1)).status_code, 201)
+        response = client_for(other).post(
+            self.url, json.dumps(application_data(1)), content_type="application/json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+
+class ConditionalGetTests(TestCase):
+    """ETags on the application lists and certificate metadata: 304 on a match, a new ETag after a transition."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.applicant = User.objects.create_user("applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        cls.registrar = User.objects.create_user(
+            "registrar", "pw", county="Nairobi", registry="Nairobi", role="is_registrar"
+        )
+        cls.application = OfficialSearchApplication.objects.create(
+            applicant=cls.applicant, status="submitted", **application_data(1)
+        )
+        completed = OfficialSearchApplication.objects.create(
+            applicant=cls.applicant, status="completed", assigned_to=cls.registrar, **application_data(2)
+        )
+        cls.certificate = Certificate.objects.create(
+            application=completed, uploaded_by=cls.registrar, signed_file="certificates/signed.pdf"
+        )
+
+    def setUp(self):
+        self.client = client_for(self.applicant)
+
+    def test_list_answers_304_without_loading_the_page(self):
+        response = self.client.get("/api/v1/applications")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(1):  # the aggregate behind the ETag
+            response = self.client.get("/api/v1/applications", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        # the ETag covers the exact query, so another page size is another representation
+        self.assertNotEqual(self.client.get("/api/v1/applications?page_size=1")["ETag"], etag)
+
+    def test_transition_changes_the_list_etag(self):
+        etag = self.client.get("/api/v1/applications")["ETag"]
+        transition(self.application, "assign", assigned_to=self.registrar)
+
+        response = self.client.get("/api/v1/applications", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_certificate_metadata_answers_304(self):
+        url = f"/api/v1/certificates/{self.certificate.pk}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+class ApplicationExportTests(TestCase):
+    """registrar-in-charge/export: CSV cells that a spreadsheet would run as formulas are neutralised."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.in_charge = User.objects.create_user(
+            "in-charge", "pw", county="Nairobi", registry="Nairobi", role="is_registrar_in_charge"
+        )
+        applicant = User.objects.create_user("@applicant", "pw", county="Nairobi", registry="Nairobi", role="normal")
+        cls.application = OfficialSearchApplication.objects.create(
+            applicant=applicant, status="paid",
+            **application_data(0, parcel_number='=HYPERLINK("http://example.com","x")'),
+        )
+        Payment.objects.create(application=cls.application, amount=1050)
+
+    def export(self, output):
+        response = client_for(self.in_charge).get(f"/api/v1/registrar-in-charge/export?output={output}")
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_escapes_formula_cells(self):
+        header, row = csv.reader(io.StringIO(self.export("csv")))
+        row = dict(zip(header, row))
+        self.assertEqual(row["parcel_number"], '\'=HYPERLINK("http://example.com","x")')
+        self.assertEqual(row["applicant__username"], "'@applicant")
+        self.assertEqual(row["payment__amount"], "1050.00")
+        self.assertEqual(row["id"], str(self.application.id))
+
+    def test_ndjson_keeps_values_as_is(self):
+        row = json.loads(self.export("ndjson"))
+        self.assertEqual(row["parcel_number"], '=HYPERLINK("http://example.com","x")')
+        self.assertEqual(row["applicant__username"], "@applicant")
@@ -0,0 +1,106 @@
+"""
+Application status transitions.
+
+Every status change goes through here as a conditional UPDATE (`... WHERE status = <source>`)
+that writes only the status and the columns the transition sets, so two requests racing on
+the same application can't both succeed: the loser's UPDATE matches no row. The registry
+status counters are adjusted, and an ApplicationEvent is appended per application moved,
+in the same transaction. modified_at is set with the status, since .update() skips auto_now.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .models import ApplicationEvent, OfficialSearchApplication
+
+# action -> (statuses it can start from, status it ends in)
+TRANSITIONS = {
+    "pay": (("pending",), "submitted"),
+    "assign": (("submitted", "assigned"), "assigned"),
+    "approve": (("assigned",), "completed"),
+    "reject": (("assigned",), "rejected"),
+}
+
+# actions only the assigned registrar may take: their UPDATE is also guarded on the registrar
+# the application was read with, so one reassigned in the meantime can't be decided by the old one
+HOLDER_ACTIONS = ("approve", "reject")
+
+
+_unchanged = object()
+
+
+class TransitionNotAllowed(Exception):
+    def __init__(self, action, status):
+        super().__init__(f"Cannot {action} an application that is {status}.")
+        self.action = action
+        self.status = status
+
+
+def transition(application, action, **changes):
+    """
+    Apply `action` to `application` with a single UPDATE guarded on the status (and, for
+    HOLDER_ACTIONS, the registrar) it was read with, also setting `changes`. Raises
+    TransitionNotAllowed if that status can't start the action or another request changed
+    it first; otherwise updates the instance in place.
+    """
+    sources, target = TRANSITIONS[action]
+    previous = application.status
+    if previous not in sources:
+        raise TransitionNotAllowed(action, previous)
+    changes.setdefault("modified_at", timezone.now())
+
+    guard = {"pk": application.pk, "status": previous}
+    if action in HOLDER_ACTIONS:
+        guard["assigned_to_id"] = application.assigned_to_id
+
+    with transaction.atomic():
+        updated = OfficialSearchApplication.objects.filter(**guard).update(status=target, **changes)
+        if not updated:
+            raise TransitionNotAllowed(action, "no longer " + previous)
+        counters.record_transition(application.registry, previous, target)
+
+        application.status = target
+        for field, value in changes.items():
+            setattr(application, field, value)
+        ApplicationEvent.objects.create(
+            application_id=application.pk, registry=application.registry,
+            from_status=previous, to_status=target, registrar_id=application.assigned_to_id,
+        )
+    return application
+
+
+def transition_many(queryset, action, registry, sources=None, **changes):
+    """
+    Apply `action` to the applications of `registry` in `queryset`: per source status
+    (optionally narrowed to `sources`), lock the matching rows, move them with one UPDATE and
+    log them with one bulk INSERT. Rows in any other status are left alone. Returns the
+    number of applications moved.
+    """
+    allowed, target = TRANSITIONS[action]
+    sources = allowed if sources is None else [status for status in allowed if status in sources]
+    queryset = queryset.filter(registry=registry)
+    if "assigned_to" in changes:
+        new_registrar = getattr(changes["assigned_to"], "pk", changes["assigned_to"])
+    else:
+        new_registrar = changes.get("assigned_to_id", _unchanged)
+    changes.setdefault("modified_at", timezone.now())
+    moved = 0
+    with transaction.atomic():
+        # rows already in the target status first, so rows moved by this call aren't matched twice
+        for source in sorted(sources, key=lambda status: status != target):
+            rows = list(queryset.select_for_update().filter(status=source).values_list("id", "assigned_to_id"))
+            if not rows:
+                continue
+            updated = queryset.filter(id__in=[app_id for app_id, _ in rows], status=source).update(
+                status=target, **changes
+            )
+            counters.record_transition(registry, source, target, updated)
+            ApplicationEvent.objects.bulk_create([
+                ApplicationEvent(
+                    application_id=app_id, registry=registry, from_status=source, to_status=target,
+                    registrar_id=registrar_id if new_registrar is _unchanged else new_registrar,
+                )
+                for app_id, registrar_id in rows
+            ])
+            moved += updated
+    return moved
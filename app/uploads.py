@@ -0,0 +1,102 @@
+"""
+On-disk side of resumable certificate uploads. Chunks are written straight from the
+request stream into MEDIA_ROOT/<CHUNKED_UPLOAD_DIR>/<upload id>.part, so a chunk is
+never held in worker memory. An upload not used for an approval within CHUNKED_UPLOAD_TTL
+seconds of being started is abandoned: the endpoints stop finding it, and
+`manage.py purge_stale_uploads` deletes the row and its part file.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import CertificateUpload
+from .tasks import remove_file
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    pass
+
+
+def part_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, settings.CHUNKED_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def write_chunk(upload, stream, start, length, expected_sha256):
+    """Copy `length` bytes from stream into the part file at `start`, verifying the chunk's SHA-256."""
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+        part.seek(start)
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            digest.update(data)
+            part.write(data)
+            written += len(data)
+        if written != length or digest.hexdigest() != expected_sha256.lower():
+            # drop the bad chunk so the client can resend from the same offset
+            part.truncate(start)
+            if written != length:
+                raise ChunkError(f"Expected {length} bytes, received {written}.")
+            raise ChunkError("Chunk checksum mismatch.")
+        part.truncate(start + length)
+
+
+def file_sha256(upload):
+    digest = hashlib.sha256()
+    with open(part_path(upload), "rb") as part:
+        for data in iter(lambda: part.read(READ_SIZE), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def open_part(upload):
+    return File(open(part_path(upload), "rb"), name=upload.filename)
+
+
+def discard(upload):
+    remove_file(part_path(upload))
+
+
+def discard_on_commit(upload):
+    # resolve the path now: the upload row may be deleted (and its pk cleared) before commit;
+    # the file is removed as soon as the transaction commits, and only a removal that fails
+    # there is left to a `run_jobs` worker to retry
+    path = part_path(upload)
+
+    def remove():
+        try:
+            remove_file(path)
+        except OSError:
+            enqueue(remove_file, path=path)
+
+    transaction.on_commit(remove)
+
+
+def expiry_cutoff():
+    """Uploads started before this moment are abandoned."""
+    return timezone.now() - timedelta(seconds=getattr(settings, "CHUNKED_UPLOAD_TTL", 24 * 60 * 60))
+
+
+def live_uploads():
+    return CertificateUpload.objects.filter(created_at__gt=expiry_cutoff())
+
+
+def purge_stale():
+    """Delete abandoned uploads and their part files; returns how many were removed."""
+    stale = list(CertificateUpload.objects.filter(created_at__lte=expiry_cutoff()).values_list("pk", flat=True))
+    CertificateUpload.objects.filter(pk__in=stale).delete()
+    for pk in stale:
+        discard(CertificateUpload(pk=pk))
+    return len(stale)
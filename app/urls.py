@@ -1,10 +1,14 @@
 from django.urls import path
 from .views import (RegisterView, LoginView,
                     ApplicantApplicationCreateView, ApplicantApplicationListView,
-    PaymentCreateView, ApplicantDownloadCertificateView,
-    SubmittedApplicationsListView, AssignRegistrarView,
+    ApplicantApplicationBulkCreateView,
+    PaymentCreateView, ApplicantDownloadCertificateView, ApplicantCertificateFileView,
+    SubmittedApplicationsListView, AssignRegistrarView, BulkAssignRegistrarView,
+    ApplicationExportView, RegistryDashboardView, RegistryLatencyView,
     AssignedApplicationsListView, ApproveApplicationView,
-    RejectApplicationView,UserListView)
+    RejectApplicationView,UserListView,
+    CertificateUploadCreateView, CertificateUploadView, CertificateUploadCompleteView)
+from .async_views import AsyncApplicationListView, AsyncCertificateFileView
 
 urlpatterns = [
     #authentication
@@ -14,18 +18,35 @@ urlpatterns = [
 
      # Applicant
     path("applications/create", ApplicantApplicationCreateView.as_view()),
+    path("applications/bulk-create", ApplicantApplicationBulkCreateView.as_view()),
     path("applications", ApplicantApplicationListView.as_view()),
     path("applications/<int:application_id>/pay", PaymentCreateView.as_view()),
     path("certificates/<int:pk>", ApplicantDownloadCertificateView.as_view()),
+    path("certificates/<int:pk>/file", ApplicantCertificateFileView.as_view()),
 
     # Registrar In Charge
     path("registrar-in-charge/submitted", SubmittedApplicationsListView.as_view()),
     path("registrar-in-charge/assign/<int:application_id>", AssignRegistrarView.as_view()),
+    path("registrar-in-charge/assign-bulk", BulkAssignRegistrarView.as_view()),
+    path("registrar-in-charge/export", ApplicationExportView.as_view()),
+    path("registrar-in-charge/dashboard", RegistryDashboardView.as_view()),
+    path("registrar-in-charge/latency", RegistryLatencyView.as_view()),
 
     # Registrar
     path("registrar/assigned", AssignedApplicationsListView.as_view()),
     path("registrar/approve/<int:application_id>", ApproveApplicationView.as_view()),
     path("registrar/reject/<int:application_id>", RejectApplicationView.as_view()),
+    path("registrar/approve/<int:application_id>/uploads", CertificateUploadCreateView.as_view()),
+    path("registrar/uploads/<uuid:upload_id>", CertificateUploadView.as_view()),
+    path("registrar/uploads/<uuid:upload_id>/complete", CertificateUploadCompleteView.as_view()),
 
-   
+    # Async (ASGI) variants of the read endpoints
+    path("async/applications",
+         AsyncApplicationListView.as_view(sync_view_class=ApplicantApplicationListView)),
+    path("async/certificates/<int:pk>/file",
+         AsyncCertificateFileView.as_view(sync_view_class=ApplicantCertificateFileView)),
+    path("async/registrar-in-charge/submitted",
+         AsyncApplicationListView.as_view(sync_view_class=SubmittedApplicationsListView)),
+    path("async/registrar/assigned",
+         AsyncApplicationListView.as_view(sync_view_class=AssignedApplicationsListView)),
 ]
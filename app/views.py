@@ -5,19 +5,39 @@ from rest_framework.views import APIView
 from django.contrib.auth import authenticate
 from .serializers import (RegisterSerializer,
         ApplicationSerializer, PaymentSerializer,
-        CertificateSerializer, ReviewSerializer,
-        UserSerializer,LoginSerializer,UserListSerializer,AssignRegistrarSerializer)
+        CertificateSerializer, ReviewSerializer, CertificateUploadSerializer,
+        UserSerializer,LoginSerializer,UserListSerializer,AssignRegistrarSerializer,
+        BulkAssignRegistrarSerializer)
 from django.contrib.auth import get_user_model
 import jwt
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import ClaimsJWTAuthentication, tokens_for_user
 from rest_framework.permissions import IsAuthenticated
 from .permissions import IsApplicant, IsRegistrar, IsRegistrarInCharge
 from django.shortcuts import get_object_or_404
-from .models import OfficialSearchApplication,Certificate
-from django.http import Http404
+from .models import OfficialSearchApplication,Certificate,CertificateUpload
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.core.serializers.json import DjangoJSONEncoder
+import csv
+import json
 from drf_yasg.utils import swagger_auto_schema
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import ApplicationFilter
+from .pagination import ApplicationPaginationMixin
+from .conditional import ConditionalListMixin, conditional
+from .downloads import serve_file
+from .uploads import ChunkError, write_chunk, file_sha256, open_part, discard, discard_on_commit, live_uploads
+from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
+import re
+import hmac
+from . import counters, latency, metrics
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.http import quote_etag
+from .transitions import TransitionNotAllowed, transition
+from .idempotency import idempotent
 
 
 
@@ -31,6 +51,8 @@ class RegisterView(generics.CreateAPIView):
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    # tokens in the body: never compressed (see CompressionMiddleware)
+    compress_response = False
     
     @swagger_auto_schema(request_body=LoginSerializer)#passing request body to swagger manuallly
     def post(self, request):
@@ -42,7 +64,7 @@ class LoginView(APIView):
 
         user = authenticate(username=username, password=password)
         if user:
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
             return Response({
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
@@ -52,6 +74,7 @@ class LoginView(APIView):
         return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
 
 class UserListView(generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     queryset = User.objects.all()
     serializer_class = UserListSerializer        
 
@@ -63,23 +86,52 @@ class ApplicantApplicationCreateView(generics.CreateAPIView):
     filter_backends = [DjangoFilterBackend]
     filterset_class = ApplicationFilter
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(applicant=self.request.user)
 
 
-class ApplicantApplicationListView(generics.ListAPIView):
+class ApplicantApplicationBulkCreateView(APIView):
+    permission_classes = [IsAuthenticated, IsApplicant]
+    max_batch_size = 100
+
+    @swagger_auto_schema(request_body=ApplicationSerializer(many=True))
+    @idempotent
+    def post(self, request):
+        serializer = ApplicationSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.max_batch_size
+        )
+        if not serializer.is_valid():
+            # per-item errors line up with the submitted list; nothing is inserted
+            return Response({"errors": serializer.errors}, status=400)
+
+        applications = serializer.save(applicant=request.user)
+        created = OfficialSearchApplication.objects.filter(
+            id__in=[application.id for application in applications]
+        ).order_by("id").with_related()
+        return Response(ApplicationSerializer(created, many=True).data, status=201)
+
+
+class ApplicantApplicationListView(ConditionalListMixin, ApplicationPaginationMixin, generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = ApplicationSerializer
     permission_classes = [IsAuthenticated, IsApplicant]
     filter_backends = [DjangoFilterBackend]
     filterset_class = ApplicationFilter
 
     def get_queryset(self):
-        return OfficialSearchApplication.objects.filter(applicant=self.request.user)
+        return OfficialSearchApplication.objects.filter(
+            applicant_id=self.request.user.id
+        ).order_by("submitted_at", "id").with_related(ApplicationSerializer.relations(self.request))
 
 
 class PaymentCreateView(APIView):
     permission_classes = [IsAuthenticated, IsApplicant]
 
+    @idempotent
     def post(self, request, application_id):
         application = get_object_or_404(OfficialSearchApplication, id=application_id)
 
@@ -87,25 +139,50 @@ class PaymentCreateView(APIView):
         if application.applicant != request.user:
             return Response({"error": "You can only pay for your own applications."}, status=403)
 
-        if application.status.lower() != "pending":
-            return Response({"error": "Payment already done or not allowed."}, status=400)
-
         serializer = PaymentSerializer(data=request.data, context={"application": application})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        try:
+            serializer.save()
+        except TransitionNotAllowed:
+            return Response({"error": "Payment already done or not allowed."}, status=400)
         return Response(serializer.data, status=201)
 
 
 
 class ApplicantDownloadCertificateView(generics.RetrieveAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = CertificateSerializer
     permission_classes = [IsAuthenticated, IsApplicant]
 
     def get_queryset(self):
-        return Certificate.objects.filter(application__applicant=self.request.user)
+        return Certificate.objects.filter(application__applicant_id=self.request.user.id)
+
+    def retrieve(self, request, *args, **kwargs):
+        certificate = self.get_object()
+        #certificates never change once issued, so the upload time is a complete validator
+        etag = quote_etag(f"{certificate.pk:x}-{int(certificate.uploaded_at.timestamp()):x}")
+        return conditional(
+            request, lambda: Response(self.get_serializer(certificate).data),
+            etag, int(certificate.uploaded_at.timestamp()),
+        )
+
 
+class ApplicantCertificateFileView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsApplicant]
+
+    def get(self, request, pk):
+        #ownership check and file name in a single query
+        certificate = Certificate.objects.filter(
+            pk=pk, application__applicant_id=request.user.id
+        ).only("signed_file").first()
+        if certificate is None or not certificate.signed_file:
+            raise Http404
+        return serve_file(request, certificate.signed_file)
 
-class SubmittedApplicationsListView(generics.ListAPIView):
+
+class SubmittedApplicationsListView(ConditionalListMixin, ApplicationPaginationMixin, generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = ApplicationSerializer
     permission_classes = [IsAuthenticated, IsRegistrarInCharge]
     filter_backends = [DjangoFilterBackend]
@@ -113,10 +190,83 @@ class SubmittedApplicationsListView(generics.ListAPIView):
 
     def get_queryset(self):
         return OfficialSearchApplication.objects.exclude(
-        status__iexact="pending"#except unpaid ones
+        status="pending"#except unpaid ones
     ).filter(
         registry=self.request.user.registry
-    )
+    ).order_by("submitted_at", "id").with_related(ApplicationSerializer.relations(self.request))
+
+
+
+
+class Echo:
+    #file-like object for csv.writer that hands each line back instead of storing it
+    def write(self, value):
+        return value
+
+
+class ApplicationExportView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsRegistrarInCharge]
+    chunk_size = 2000
+    columns = [
+        "id", "reference_number", "parcel_number", "county", "registry", "status", "submitted_at",
+        "applicant__username", "assigned_to__username",
+        "payment__invoice_number", "payment__payment_reference", "payment__amount", "payment__paid_at",
+        "certificate__signed_file", "certificate__uploaded_at",
+    ]
+    content_types = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def get(self, request):
+        output = request.query_params.get("output", "csv")
+        if output not in self.content_types:
+            return Response({"error": "output must be one of: csv, ndjson."}, status=400)
+
+        queryset = OfficialSearchApplication.objects.exclude(
+            status="pending"
+        ).filter(
+            registry=request.user.registry
+        ).order_by("id")
+        filterset = ApplicationFilter(request.query_params, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=400)
+
+        # payment and certificate come back joined in the same row; the iterator keeps memory flat
+        rows = filterset.qs.values_list(*self.columns).iterator(chunk_size=self.chunk_size)
+        stream = self.csv_lines(rows) if output == "csv" else self.ndjson_lines(rows)
+
+        response = StreamingHttpResponse(self.batched(stream), content_type=self.content_types[output])
+        response["Content-Disposition"] = f'attachment; filename="applications.{output}"'
+        return response
+
+    # a spreadsheet runs a cell starting with one of these as a formula
+    formula_prefixes = ("=", "+", "-", "@", "\t", "\r")
+
+    def csv_lines(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.columns)
+        for row in rows:
+            yield writer.writerow([self.csv_cell(value) for value in row])
+
+    def csv_cell(self, value):
+        #applicant-supplied text is neutralised with a leading quote; numbers and dates pass through
+        if isinstance(value, str) and value.startswith(self.formula_prefixes):
+            return "'" + value
+        return value
+
+    def ndjson_lines(self, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(self.columns, row)), cls=DjangoJSONEncoder) + "\n"
+
+    def batched(self, lines):
+        #a few hundred rows per write instead of one syscall per row
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= 500:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
 
 
 
@@ -140,12 +290,6 @@ class AssignRegistrarView(APIView):
                 status=403
             )
 
-        if application.status not in ["submitted", "assigned"]:
-            return Response(
-                 {"error": "Only submitted or already assigned applications can be reassigned."},
-                status=400
-            )
-
         serializer = AssignRegistrarSerializer(
             data=request.data,
             context={"application": application}
@@ -168,7 +312,13 @@ class AssignRegistrarView(APIView):
                 status=403
             )
 
-        serializer.save()
+        try:
+            serializer.save()
+        except TransitionNotAllowed:
+            return Response(
+                {"error": "Only submitted or already assigned applications can be reassigned."},
+                status=400
+            )
 
         return Response({
             "message": f"Application #{application.id} assigned to {registrar.username}"
@@ -177,7 +327,73 @@ class AssignRegistrarView(APIView):
 
 
 
-class AssignedApplicationsListView(generics.ListAPIView):
+class BulkAssignRegistrarView(APIView):
+    permission_classes = [IsAuthenticated, IsRegistrarInCharge]
+
+    @swagger_auto_schema(request_body=BulkAssignRegistrarSerializer)
+    def post(self, request):
+        serializer = BulkAssignRegistrarSerializer(
+            data=request.data,
+            context={"registry": request.user.registry}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        registrar = serializer.validated_data["registrar_id"]
+
+        #Ensure registrar belongs to same registry as RIC
+        if registrar.registry != request.user.registry:
+            return Response(
+                {"error": "You can only assign to registrars within your own registry."},
+                status=403
+            )
+
+        results = serializer.save()
+        return Response({
+            "assigned": sum("assigned_to" in result for result in results),
+            "results": results,
+        }, status=200)
+
+
+
+
+class RegistryDashboardView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsRegistrarInCharge]
+
+    def get(self, request):
+        #read from the denormalized counters, never from the applications table
+        return Response({
+            "registry": request.user.registry,
+            "counts": counters.snapshot(request.user.registry),
+        })
+
+
+class RegistryLatencyView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsRegistrarInCharge]
+
+    def get(self, request):
+        #p50/p95 time spent in each status over the last ?days= (default 30)
+        try:
+            days = int(request.query_params.get("days", 30))
+        except (ValueError, OverflowError):
+            days = None
+        if days is None or not 1 <= days <= latency.MAX_DAYS:
+            return Response({"error": f"days must be a whole number from 1 to {latency.MAX_DAYS}."}, status=400)
+        since = timezone.now() - timedelta(days=days)
+        registry = request.user.registry
+        return Response({
+            "registry": registry,
+            "since": since,
+            "by_status": latency.time_in_state("registry", registry=registry, since=since),
+            "by_registrar": latency.time_in_state("registrar", registry=registry, since=since),
+        })
+
+
+
+
+class AssignedApplicationsListView(ConditionalListMixin, ApplicationPaginationMixin, generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = ApplicationSerializer
     permission_classes = [IsAuthenticated, IsRegistrar]
 
@@ -185,7 +401,9 @@ class AssignedApplicationsListView(generics.ListAPIView):
     filterset_class = ApplicationFilter
 
     def get_queryset(self):
-        return OfficialSearchApplication.objects.filter(assigned_to=self.request.user)
+        return OfficialSearchApplication.objects.filter(
+            assigned_to_id=self.request.user.id
+        ).order_by("submitted_at", "id").with_related(ApplicationSerializer.relations(self.request))
 
 
 
@@ -196,15 +414,120 @@ class ApproveApplicationView(APIView):
     def post(self, request, application_id):
         app = get_object_or_404(OfficialSearchApplication, id=application_id, assigned_to=request.user)
 
-        if app.status not in ["assigned"]:
+        try:
+            with transaction.atomic():
+                # first, so a concurrent approval loses before any certificate is stored
+                transition(app, "approve")
+                self.attach_certificate(request, app)
+        except TransitionNotAllowed:
             return Response({"error": "Cannot approve this application."}, status=400)
+        return Response({"message": "Application approved and certificate uploaded."})
+
+    def attach_certificate(self, request, app):
+        upload_id = request.data.get("upload_id")
+        if upload_id:
+            #certificate sent earlier through the resumable upload API
+            upload = get_object_or_404(
+                live_uploads(),
+                id=serializers.UUIDField().run_validation(upload_id),
+                application=app, uploaded_by=request.user, status="complete"
+            )
+            certificate = Certificate(application=app, uploaded_by=request.user)
+            with open_part(upload) as part:
+                certificate.signed_file.save(upload.filename, part)
+            discard_on_commit(upload)
+            upload.delete()
+        else:
+            serializer = CertificateSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(application=app, uploaded_by=request.user)
+
+
+
+
+class CertificateUploadCreateView(APIView):
+    permission_classes = [IsAuthenticated, IsRegistrar]
+
+    @swagger_auto_schema(request_body=CertificateUploadSerializer)
+    def post(self, request, application_id):
+        app = get_object_or_404(OfficialSearchApplication, id=application_id, assigned_to=request.user)
+
+        if app.status not in ["assigned"]:
+            return Response({"error": "Cannot upload a certificate for this application."}, status=400)
 
-        serializer = CertificateSerializer(data=request.data)
+        serializer = CertificateUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(application=app, uploaded_by=request.user)
-        app.status = "completed"
-        app.save()
-        return Response({"message": "Application approved and certificate uploaded."})
+        return Response(serializer.data, status=201)
+
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class CertificateUploadMixin:
+    permission_classes = [IsAuthenticated, IsRegistrar]
+    # the resume offset must reflect the last chunk written, not a lagging replica
+    read_from_primary = True
+
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(live_uploads(), id=upload_id, uploaded_by=request.user)
+
+
+class CertificateUploadView(CertificateUploadMixin, APIView):
+
+    def get(self, request, upload_id):
+        #lets a client resume from `received` after a dropped connection
+        return Response(CertificateUploadSerializer(self.get_upload(request, upload_id)).data)
+
+    def put(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload.status != "uploading":
+            return Response({"error": "Upload already completed."}, status=400)
+
+        match = CONTENT_RANGE_RE.match(request.headers.get("Content-Range", ""))
+        if not match:
+            return Response({"error": "A 'Content-Range: bytes start-end/total' header is required."}, status=400)
+        start, end, total = map(int, match.groups())
+        length = end - start + 1
+        if total != upload.size or end >= upload.size or length <= 0:
+            return Response({"error": "Content-Range does not match this upload."}, status=400)
+        if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response({"error": "Chunk too large."}, status=413)
+        if start != upload.received:
+            return Response({"error": "Chunks must be sent in order.", "received": upload.received}, status=409)
+
+        checksum = request.headers.get("X-Chunk-SHA256")
+        if not checksum:
+            return Response({"error": "An X-Chunk-SHA256 header is required."}, status=400)
+
+        try:
+            write_chunk(upload, request.stream, start, length, checksum)
+        except ChunkError as exc:
+            return Response({"error": str(exc), "received": upload.received}, status=400)
+
+        CertificateUpload.objects.filter(pk=upload.pk, received=start).update(received=start + length)
+        return Response({"received": start + length})
+
+
+class CertificateUploadCompleteView(CertificateUploadMixin, APIView):
+
+    def post(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        if upload.status == "uploading":
+            if upload.received != upload.size:
+                return Response({"error": "Upload is incomplete.", "received": upload.received}, status=400)
+
+            checksum = file_sha256(upload)
+            if upload.sha256 and checksum != upload.sha256:
+                discard(upload)
+                upload.received = 0
+                upload.save(update_fields=["received"])
+                return Response({"error": "File checksum mismatch, upload restarted.", "received": 0}, status=400)
+
+            upload.sha256 = checksum
+            upload.status = "complete"
+            upload.save(update_fields=["sha256", "status"])
+        return Response(CertificateUploadSerializer(upload).data)
 
 
 
@@ -215,16 +538,28 @@ class RejectApplicationView(APIView):
     def post(self, request, application_id):
         app = get_object_or_404(OfficialSearchApplication, id=application_id, assigned_to=request.user)
 
-        if app.status not in ["assigned"]:
-            return Response({"error": "Cannot reject this application."}, status=400)
-
         serializer = ReviewSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(application=app, reviewer=request.user)
-        app.status = "rejected"
-        app.save()
+        try:
+            with transaction.atomic():
+                transition(app, "reject")
+                serializer.save(application=app, reviewer=request.user)
+        except TransitionNotAllowed:
+            return Response({"error": "Cannot reject this application."}, status=400)
         return Response({"message": "Application rejected with review."})                
 
 
+class MetricsView(View):
+    #Prometheus scrape endpoint: bearer METRICS_TOKEN or an address in METRICS_ALLOWED_IPS, 404 otherwise
 
+    def allowed(self, request):
+        token = settings.METRICS_TOKEN
+        scheme, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if token and scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), token.encode()):
+            return True
+        return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
 
+    def get(self, request):
+        if not self.allowed(request):
+            raise Http404
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
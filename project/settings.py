@@ -48,12 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.MetricsMiddleware',
+    'app.middleware.CompressionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,11 +85,69 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_PROFILE picks the database: "sqlite" (default) or "postgres" (configured from the DB_* variables).
+# Connections are kept open for CONN_MAX_AGE seconds instead of being opened per request.
+DB_PROFILE = os.environ.get("DB_PROFILE", "sqlite")
+CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+
+if DB_PROFILE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("DB_NAME", "search_module"),
+            'USER': os.environ.get("DB_USER", "postgres"),
+            'PASSWORD': os.environ.get("DB_PASSWORD", ""),
+            'HOST': os.environ.get("DB_HOST", "localhost"),
+            'PORT': os.environ.get("DB_PORT", "5432"),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            # ping a reused connection before handing it to a request
+            'CONN_HEALTH_CHECKS': True,
+            # behind pgbouncer in transaction mode server-side cursors don't survive between queries
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get("DB_PGBOUNCER") == "1",
+            'OPTIONS': {'connect_timeout': 5},
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            # django.db.backends.sqlite3, with atomic blocks taking the write lock up front
+            'ENGINE': 'app.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            # on disk rather than in memory, so the concurrency tests' threads each get their own connection
+            'TEST': {'NAME': BASE_DIR / 'test-db.sqlite3'},
+        }
+    }
+
+# Read replica: list, lookup and export reads go to the "replica" alias when it is configured
+# (app.routers.PrimaryReplicaRouter); writes, and a user's reads for REPLICA_STICKY_SECONDS after
+# their own write, stay on the primary. Tests mirror the replica onto the primary.
+# Locally, point DB_REPLICA_NAME at a second SQLite file and refresh it with `manage.py sync_replica`.
+if DB_PROFILE == "postgres" and os.environ.get("DB_REPLICA_HOST"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ["DB_REPLICA_HOST"],
+        'PORT': os.environ.get("DB_REPLICA_PORT", DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DB_PROFILE != "postgres" and os.environ.get("DB_REPLICA_NAME"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / os.environ["DB_REPLICA_NAME"],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ["app.routers.PrimaryReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+# Applied to every new SQLite connection (app.apps.configure_sqlite). WAL lets readers carry on
+# while a payment or assignment is being written; NORMAL sync is durable in WAL mode bar power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    # milliseconds a writer waits on the lock before "database is locked"
+    "busy_timeout": 20000,
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
 }
 
 
@@ -94,13 +155,29 @@ AUTH_USER_MODEL = "app.CustomUser"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.authentication.RequestTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-        'PAGE_SIZE': 5
+        'PAGE_SIZE': 5,
+    # orjson-backed, and identical output to DRF's JSONRenderer/JSONParser (which they fall back to)
+    'DEFAULT_RENDERER_CLASSES': (
+        'app.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'app.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+# CompressionMiddleware: responses smaller than this many bytes are sent as they are.
+# Brotli needs the optional `brotli` package; without it only gzip is offered.
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
 
 
 SIMPLE_JWT = {
@@ -108,6 +185,12 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# LoginView embeds role/registry/county in tokens so read endpoints (ClaimsJWTAuthentication)
+# skip the user lookup; the token version they carry is re-checked at most every
+# AUTH_TOKEN_VERSION_TTL seconds. Set AUTH_TOKEN_CLAIMS = False to always load the user.
+AUTH_TOKEN_CLAIMS = True
+AUTH_TOKEN_VERSION_TTL = 30
+
 CORS_ORIGIN_WHITELIST = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -159,6 +242,38 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Certificate downloads can be handed to the front proxy instead of being streamed by Django:
+# "x-accel-redirect" (nginx, with an `internal` location at SENDFILE_URL_PREFIX aliased to MEDIA_ROOT)
+# or "x-sendfile" (Apache mod_xsendfile / lighttpd). None streams from Python.
+SENDFILE_BACKEND = os.environ.get("SENDFILE_BACKEND") or None
+SENDFILE_URL_PREFIX = "/protected/"
+
+# Resumable certificate uploads: partial files live under MEDIA_ROOT/CHUNKED_UPLOAD_DIR; an upload
+# not used for an approval within CHUNKED_UPLOAD_TTL seconds is removed by `manage.py purge_stale_uploads`
+CHUNKED_UPLOAD_DIR = "uploads"
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+CHUNKED_UPLOAD_TTL = 24 * 60 * 60
+
+# Idempotency-Key on payment and application POSTs (app.idempotency): seconds a response is
+# replayed for, and seconds a crashed first request keeps the key locked
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Background jobs (app.jobs, run by `manage.py run_jobs`): attempts before a job is left as
+# failed, retry delay doubling from JOB_RETRY_DELAY up to JOB_RETRY_MAX_DELAY seconds, and
+# seconds after which a job whose worker died is picked up again
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 5
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_LOCK_TIMEOUT = 10 * 60
+
+# /metrics (Prometheus text format) answers a scraper sending "Authorization: Bearer <METRICS_TOKEN>",
+# or a client address listed in METRICS_ALLOWED_IPS; both are empty by default, so it answers no one.
+# Behind a same-host proxy every request arrives from loopback, so only list addresses the proxy can't forward
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+
 
 # SWAGGER_SETTINGS to ensure proper display of the UI
 SWAGGER_SETTINGS = {
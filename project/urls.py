@@ -6,6 +6,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.views.generic.base import RedirectView
+from app.views import MetricsView
 
 
 schema_view = get_schema_view(
@@ -23,6 +24,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/v1/", include("app.urls")),
+    path("metrics", MetricsView.as_view(), name="metrics"),
     path(
         "api/v1/docs/",
         schema_view.with_ui("swagger", cache_timeout=0),